@@ -11,10 +11,10 @@ from highway_env import utils
 from highway_env.envs.common.action import action_factory, Action, DiscreteMetaAction, ActionType
 from highway_env.envs.common.observation import observation_factory, ObservationType
 from highway_env.envs.common.finite_mdp import finite_mdp
-from highway_env.envs.common.graphics import EnvViewer
 from highway_env.vehicle.behavior import IDMVehicle, LinearVehicle
 from highway_env.vehicle.controller import MDPVehicle
 from highway_env.vehicle.kinematics import Vehicle
+from highway_env.vehicle.vectorized import VectorizedBehavior, VectorizedKinematics
 
 Observation = TypeVar("Observation")
 
@@ -106,7 +106,10 @@ class AbstractEnv(gym.Env):
             "render_agent": True,
             "offscreen_rendering": os.environ.get("OFFSCREEN_RENDERING", "0") == "1",
             "manual_control": False,
-            "real_time_rendering": False
+            "real_time_rendering": False,
+            "skip_step_outputs": False,  # Only step the simulation: no observation, reward nor info
+            "vectorized_kinematics": False,  # Integrate the kinematics of all vehicles in a single update
+            "vectorized_behavior": False  # Compute the IDM and MOBIL decisions of all vehicles in a single batch
         }
 
     def configure(self, config: dict) -> None:
@@ -122,7 +125,8 @@ class AbstractEnv(gym.Env):
         """
         Set the types and spaces of observation and action from config.
         """
-        self.observation_type = observation_factory(self, self.config["observation"])
+        self.observation_type = observation_factory(self, {"type": "NoObservation"}
+                                                    if self.config["skip_step_outputs"] else self.config["observation"])
         self.action_type = action_factory(self, self.config["action"])
         self.observation_space = self.observation_type.space()
         self.action_space = self.action_type.space()
@@ -203,9 +207,13 @@ class AbstractEnv(gym.Env):
         self.time = self.steps = 0
         self.done = False
         self._reset()
+        if self.config["vectorized_kinematics"]:
+            self.road.vectorized_kinematics = VectorizedKinematics()
+        if self.config["vectorized_behavior"]:
+            self.road.vectorized_behavior = VectorizedBehavior()
         self.define_spaces()  # Second, to link the obs and actions to the vehicles once the scene is created
         obs = self.observation_type.observe()
-        info = self._info(obs, action=self.action_space.sample())
+        info = self._info(obs, action=self.action_space.sample()) if not self.config["skip_step_outputs"] else {}
         if self.render_mode == 'human':
             self.render()
         return obs, info
@@ -235,10 +243,11 @@ class AbstractEnv(gym.Env):
         self._simulate(action)
 
         obs = self.observation_type.observe()
-        reward = self._reward(action)
+        skip = self.config["skip_step_outputs"]  # The caller reads the simulation state, only the episode end matters
+        reward = self._reward(action) if not skip else 0.0
         terminated = self._is_terminated()
         truncated = self._is_truncated()
-        info = self._info(obs, action)
+        info = self._info(obs, action) if not skip else {}
         if self.render_mode == 'human':
             self.render()
 
@@ -280,6 +289,7 @@ class AbstractEnv(gym.Env):
             )
             return
         if self.viewer is None:
+            from highway_env.envs.common.graphics import EnvViewer
             self.viewer = EnvViewer(self)
 
         self.enable_auto_render = True
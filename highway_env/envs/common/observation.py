@@ -3,17 +3,16 @@ from itertools import product
 from typing import List, Dict, TYPE_CHECKING, Optional, Union, Tuple
 from gymnasium import spaces
 import numpy as np
-import pandas as pd
 
 from highway_env import utils
 from highway_env.envs.common.finite_mdp import compute_ttc_grid
-from highway_env.envs.common.graphics import EnvViewer
 from highway_env.road.lane import AbstractLane
 from highway_env.utils import distance_to_circle, Vector
 from highway_env.vehicle.controller import MDPVehicle
 from highway_env.vehicle.kinematics import Vehicle
 
 if TYPE_CHECKING:
+    import pandas as pd
     from highway_env.envs.common.abstract import AbstractEnv
 
 
@@ -84,6 +83,7 @@ class GrayscaleObservation(ObservationType):
             "scaling": scaling or viewer_config["scaling"],
             "centering_position": centering_position or viewer_config["centering_position"]
         })
+        from highway_env.envs.common.graphics import EnvViewer
         self.viewer = EnvViewer(env, config=viewer_config)
 
     def space(self) -> spaces.Space:
@@ -180,13 +180,10 @@ class KinematicObservation(ObservationType):
     def space(self) -> spaces.Space:
         return spaces.Box(shape=(self.vehicles_count, len(self.features)), low=-np.inf, high=np.inf, dtype=np.float32)
 
-    def normalize_obs(self, df: pd.DataFrame) -> pd.DataFrame:
-        """
-        Normalize the observation values.
+    RELATIVE_FEATURES: List[str] = ['x', 'y', 'vx', 'vy']
+    """Features expressed relatively to the observer vehicle, unless the observation is absolute"""
 
-        For now, assume that the road is straight along the x axis.
-        :param Dataframe df: observation data
-        """
+    def _init_features_range(self) -> None:
         if not self.features_range:
             side_lanes = self.env.road.network.all_side_lanes(self.observer_vehicle.lane_index)
             self.features_range = {
@@ -195,6 +192,15 @@ class KinematicObservation(ObservationType):
                 "vx": [-2*Vehicle.MAX_SPEED, 2*Vehicle.MAX_SPEED],
                 "vy": [-2*Vehicle.MAX_SPEED, 2*Vehicle.MAX_SPEED]
             }
+
+    def normalize_obs(self, df: 'pd.DataFrame') -> 'pd.DataFrame':
+        """
+        Normalize the observation values.
+
+        For now, assume that the road is straight along the x axis.
+        :param Dataframe df: observation data
+        """
+        self._init_features_range()
         for feature, f_range in self.features_range.items():
             if feature in df:
                 df[feature] = utils.lmap(df[feature], [f_range[0], f_range[1]], [-1, 1])
@@ -202,12 +208,29 @@ class KinematicObservation(ObservationType):
                     df[feature] = np.clip(df[feature], -1, 1)
         return df
 
+    def normalize_array(self, obs: np.ndarray) -> np.ndarray:
+        """
+        Normalize the observation values in place, as normalize_obs does for a DataFrame.
+
+        :param obs: observation data, of shape (vehicles, features)
+        :return: the normalized observation
+        """
+        self._init_features_range()
+        for feature, f_range in self.features_range.items():
+            if feature in self.features:
+                j = self.features.index(feature)
+                obs[:, j] = utils.lmap(obs[:, j], [f_range[0], f_range[1]], [-1, 1])
+                if self.clip:
+                    obs[:, j] = np.clip(obs[:, j], -1, 1)
+        return obs
+
     def observe(self) -> np.ndarray:
         if not self.env.road:
             return np.zeros(self.space().shape)
 
         # Add ego-vehicle
-        df = pd.DataFrame.from_records([self.observer_vehicle.to_dict()])
+        ego_dict = self.observer_vehicle.to_dict()
+        records = [ego_dict]
         # Add nearby traffic
         close_vehicles = self.env.road.close_objects_to(self.observer_vehicle,
                                                         self.env.PERCEPTION_DISTANCE,
@@ -216,24 +239,20 @@ class KinematicObservation(ObservationType):
                                                         sort=self.order == "sorted",
                                                         vehicles_only=not self.include_obstacles)
         if close_vehicles:
-            origin = self.observer_vehicle if not self.absolute else None
-            vehicles_df = pd.DataFrame.from_records(
-                [v.to_dict(origin, observe_intentions=self.observe_intentions)
-                 for v in close_vehicles[-self.vehicles_count + 1:]])
-            df = pd.concat([df, vehicles_df], ignore_index=True)
+            for v in close_vehicles[-self.vehicles_count + 1:]:
+                d = v.to_dict(observe_intentions=self.observe_intentions)
+                if not self.absolute:  # Same as v.to_dict(origin), without observing the ego-vehicle again
+                    for key in self.RELATIVE_FEATURES:
+                        d[key] -= ego_dict[key]
+                records.append(d)
 
-        df = df[self.features]
+        # Missing features and rows are filled with nan and zeros
+        obs = np.zeros((max(self.vehicles_count, len(records)), len(self.features)))
+        obs[:len(records)] = [[d.get(feature, np.nan) for feature in self.features] for d in records]
 
         # Normalize and clip
         if self.normalize:
-            df = self.normalize_obs(df)
-        # Fill missing rows
-        if df.shape[0] < self.vehicles_count:
-            rows = np.zeros((self.vehicles_count - df.shape[0], len(self.features)))
-            df = pd.concat([df, pd.DataFrame(data=rows, columns=self.features)], ignore_index=True)
-        # Reorder
-        df = df[self.features]
-        obs = df.values.copy()
+            self.normalize_array(obs[:len(records)])
         if self.order == "shuffled":
             self.env.np_random.shuffle(obs[1:])
         # Flatten
@@ -289,7 +308,7 @@ class OccupancyGridObservation(ObservationType):
         else:
             return spaces.Box(shape=self.grid.shape, low=-np.inf, high=np.inf, dtype=np.float32)
 
-    def normalize(self, df: pd.DataFrame) -> pd.DataFrame:
+    def normalize(self, df: 'pd.DataFrame') -> 'pd.DataFrame':
         """
         Normalize the observation values.
 
@@ -317,6 +336,7 @@ class OccupancyGridObservation(ObservationType):
             self.grid.fill(np.nan)
 
             # Get nearby traffic data
+            import pandas as pd
             df = pd.DataFrame.from_records(
                 [v.to_dict(self.observer_vehicle) for v in self.env.road.vehicles])
             # Normalize
@@ -445,6 +465,7 @@ class KinematicsGoalObservation(KinematicObservation):
                 ("desired_goal", np.zeros((len(self.features),)))
             ])
 
+        import pandas as pd
         obs = np.ravel(pd.DataFrame.from_records([self.observer_vehicle.to_dict()])[self.features])
         goal = np.ravel(pd.DataFrame.from_records([self.env.goal.to_dict()])[self.features])
         obs = OrderedDict([
@@ -520,6 +541,7 @@ class ExitObservation(KinematicObservation):
             return np.zeros(self.space().shape)
 
         # Add ego-vehicle
+        import pandas as pd
         ego_dict = self.observer_vehicle.to_dict()
         exit_lane = self.env.road.network.get_lane(("1", "2", -1))
         ego_dict["x"] = exit_lane.local_coordinates(self.observer_vehicle.position)[0]
@@ -632,6 +654,17 @@ class LidarObservation(ObservationType):
         return np.array([np.cos(index * self.angle), np.sin(index * self.angle)])
 
 
+class NoObservation(ObservationType):
+
+    """An empty observation, for callers that read the simulation state directly."""
+
+    def space(self) -> spaces.Space:
+        return spaces.Box(shape=(0,), low=0, high=0, dtype=np.float32)
+
+    def observe(self) -> np.ndarray:
+        return np.zeros((0,), dtype=np.float32)
+
+
 def observation_factory(env: 'AbstractEnv', config: dict) -> ObservationType:
     if config["type"] == "TimeToCollision":
         return TimeToCollisionObservation(env, **config)
@@ -653,5 +686,7 @@ def observation_factory(env: 'AbstractEnv', config: dict) -> ObservationType:
         return LidarObservation(env, **config)
     elif config["type"] == "ExitObservation":
         return ExitObservation(env, **config)
+    elif config["type"] == "NoObservation":
+        return NoObservation(env, **config)
     else:
         raise ValueError("Unknown observation type")
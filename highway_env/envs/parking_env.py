@@ -8,7 +8,6 @@ from highway_env.envs.common.abstract import AbstractEnv
 from highway_env.envs.common.observation import MultiAgentObservation, observation_factory
 from highway_env.road.lane import StraightLane, LineType
 from highway_env.road.road import Road, RoadNetwork
-from highway_env.vehicle.graphics import VehicleGraphics
 from highway_env.vehicle.kinematics import Vehicle
 from highway_env.vehicle.objects import Landmark, Obstacle
 
@@ -151,6 +150,7 @@ class ParkingEnv(AbstractEnv, GoalEnv):
         empty_spots = list(self.road.network.lanes_dict().keys())
 
         # Controlled vehicles
+        from highway_env.vehicle.graphics import VehicleGraphics
         self.controlled_vehicles = []
         for i in range(self.config["controlled_vehicles"]):
             vehicle = self.action_type.vehicle_class(self.road, [i*20, 0], 2*np.pi*self.np_random.uniform(), 0)
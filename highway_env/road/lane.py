@@ -130,6 +130,17 @@ class AbstractLane(object):
         """Compute non-normalised angle of heading to the lane."""
         return wrap_to_pi(heading - self.heading_at(long_offset))
 
+    def bounding_box(self) -> Optional[np.ndarray]:
+        """
+        Get an axis-aligned box enclosing the lane.
+
+        The euclidean distance from a position to this box must never exceed the lane distance() of that position,
+        so that it can be used to discard far away lanes in a search.
+
+        :return: the box [[x_min, y_min], [x_max, y_max]] [m], or None if no such box is known
+        """
+        return None
+
 
 class LineType:
 
@@ -190,6 +201,9 @@ class StraightLane(AbstractLane):
         lateral = np.dot(delta, self.direction_lateral)
         return float(longitudinal), float(lateral)
 
+    def bounding_box(self) -> Optional[np.ndarray]:
+        return np.array([np.minimum(self.start, self.end), np.maximum(self.start, self.end)])
+
     @classmethod
     def from_config(cls, config: dict):
         config["start"] = np.array(config["start"])
@@ -252,6 +266,9 @@ class SineLane(StraightLane):
         longitudinal, lateral = super().local_coordinates(position)
         return longitudinal, lateral - self.amplitude * np.sin(self.pulsation * longitudinal + self.phase)
 
+    def bounding_box(self) -> Optional[np.ndarray]:
+        return super().bounding_box() + np.array([[-1], [1]]) * np.abs(self.amplitude)
+
     @classmethod
     def from_config(cls, config: dict):
         config["start"] = np.array(config["start"])
@@ -321,6 +338,14 @@ class CircularLane(AbstractLane):
         lateral = self.direction*(self.radius - r)
         return longitudinal, lateral
 
+    def bounding_box(self) -> Optional[np.ndarray]:
+        phi_min, phi_max = sorted([self.start_phase, self.end_phase])
+        # The arc extremities, and the axis-aligned extremities of the circle that lie within the arc
+        phases = np.concatenate(([phi_min, phi_max],
+                                 np.pi / 2 * np.arange(np.ceil(phi_min / (np.pi / 2)), np.floor(phi_max / (np.pi / 2)) + 1)))
+        points = self.center + self.radius * np.stack([np.cos(phases), np.sin(phases)], axis=1)
+        return np.array([points.min(axis=0), points.max(axis=0)])
+
     @classmethod
     def from_config(cls, config: dict):
         config["center"] = np.array(config["center"])
@@ -1,3 +1,4 @@
+import bisect
 import numpy as np
 import logging
 from typing import List, Tuple, Dict, TYPE_CHECKING, Optional
@@ -17,8 +18,12 @@ Route = List[LaneIndex]
 class RoadNetwork(object):
     graph: Dict[str, Dict[str, List[AbstractLane]]]
 
+    LANE_SEARCH_TOLERANCE = 1e-6
+    """Slack on the lane distance lower bounds, to account for rounding errors [m]"""
+
     def __init__(self):
         self.graph = {}
+        self._lanes_bounds = None
 
     def add_lane(self, _from: str, _to: str, lane: AbstractLane) -> None:
         """
@@ -33,6 +38,7 @@ class RoadNetwork(object):
         if _to not in self.graph[_from]:
             self.graph[_from][_to] = []
         self.graph[_from][_to].append(lane)
+        self._lanes_bounds = None
 
     def get_lane(self, index: LaneIndex) -> AbstractLane:
         """
@@ -48,21 +54,75 @@ class RoadNetwork(object):
             _id = 0
         return self.graph[_from][_to][_id]
 
-    def get_closest_lane_index(self, position: np.ndarray, heading: Optional[float] = None) -> LaneIndex:
+    def get_closest_lane_index(self, position: np.ndarray, heading: Optional[float] = None,
+                               lane_index: Optional[LaneIndex] = None) -> LaneIndex:
         """
         Get the index of the lane closest to a world position.
 
+        Lanes are first pruned using their bounding boxes: only the lanes whose box is not further than the best
+        distance found among a few initial candidates are evaluated. The result is the same as that of an exhaustive
+        search, including the order in which ties are broken.
+
         :param position: a world position [m].
         :param heading: a heading angle [rad].
+        :param lane_index: a lane likely to be the closest, e.g. the previous lane of a moving object. It is checked
+                           first along with its side and next lanes.
         :return: the index of the closest lane.
         """
-        indexes, distances = [], []
-        for _from, to_dict in self.graph.items():
-            for _to, lanes in to_dict.items():
-                for _id, l in enumerate(lanes):
-                    distances.append(l.distance_with_heading(position, heading))
-                    indexes.append((_from, _to, _id))
-        return indexes[int(np.argmin(distances))]
+        indexes, lanes, lower, upper, order = self._lanes_bounding_boxes()
+        position = np.asarray(position, dtype=float)
+        bounds = np.linalg.norm(np.maximum(np.maximum(lower - position, position - upper), 0), axis=1)
+        distances = {}
+        for i in [order[index] for index in self._warm_start_lanes(lane_index) if index in order] \
+                or [int(np.argmin(bounds))]:
+            distances[i] = lanes[i].distance_with_heading(position, heading)
+        best = min(distances.values())
+        if not np.isfinite(best):
+            candidates = range(len(lanes))
+        else:
+            candidates = np.flatnonzero(bounds <= best + self.LANE_SEARCH_TOLERANCE)
+        for i in candidates:
+            if i not in distances:
+                distances[i] = lanes[i].distance_with_heading(position, heading)
+        return indexes[min(candidates, key=lambda i: (distances[i], i))]
+
+    def _warm_start_lanes(self, lane_index: Optional[LaneIndex]) -> List[LaneIndex]:
+        """
+        :param lane_index: the index of a lane, if any.
+        :return: the lane, its side lanes and the lanes following it.
+        """
+        try:
+            self.get_lane(lane_index)
+        except (KeyError, IndexError, TypeError):
+            return []
+        _from, _to, _id = lane_index
+        return [lane_index] + self.side_lanes(lane_index) + \
+            [(_to, next_to, i) for next_to, lanes in self.graph.get(_to, {}).items() for i in range(len(lanes))]
+
+    def _lanes_bounding_boxes(self) -> Tuple[List[LaneIndex], List[AbstractLane], np.ndarray, np.ndarray,
+                                             Dict[LaneIndex, int]]:
+        """
+        Get the bounding boxes of all lanes, built once for the network.
+
+        :return: the lane indexes and lanes in graph order, the lower and upper corners of their bounding boxes, and
+                 the position of each lane index in that order.
+        """
+        if self._lanes_bounds is None:
+            indexes, lanes, lower, upper = [], [], [], []
+            for _from, to_dict in self.graph.items():
+                for _to, lanes_ in to_dict.items():
+                    for _id, l in enumerate(lanes_):
+                        box = l.bounding_box()
+                        if box is None:  # Never discarded
+                            box = np.array([[-np.inf, -np.inf], [np.inf, np.inf]])
+                        indexes.append((_from, _to, _id))
+                        lanes.append(l)
+                        lower.append(box[0])
+                        upper.append(box[1])
+            self._lanes_bounds = (indexes, lanes, np.array(lower, dtype=float).reshape(-1, 2),
+                                  np.array(upper, dtype=float).reshape(-1, 2),
+                                  {index: i for i, index in enumerate(indexes)})
+        return self._lanes_bounds
 
     def next_lane(self, current_index: LaneIndex, route: Route = None, position: np.ndarray = None,
                   np_random: np.random.RandomState = np.random) -> LaneIndex:
@@ -270,6 +330,40 @@ class RoadNetwork(object):
         return self.get_lane(lane_index).position(longitudinal, lateral),\
                self.get_lane(lane_index).heading_at(longitudinal)
 
+    def positions_headings_along_route(self, route: Route, longitudinals: np.ndarray, lateral: float,
+                                       current_lane_index: LaneIndex) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the absolute positions and headings along a route at several longitudinal coordinates.
+
+        This is equivalent to calling position_heading_along_route for each longitudinal, but walks the route once.
+
+        :param route: a planned route, list of lane indexes
+        :param longitudinals: longitudinal positions
+        :param lateral: : lateral position
+        :param current_lane_index: current lane index of the vehicle
+        :return: positions, headings
+        """
+        longitudinals = np.array(longitudinals, dtype=float).ravel()
+        positions = np.zeros((longitudinals.size, 2))
+        headings = np.zeros(longitudinals.size)
+        pending = np.ones(longitudinals.size, dtype=bool)
+        for k, lane_index in enumerate(route):
+            if lane_index[2] is None:
+                # Same hypothesis as in position_heading_along_route: the vehicle keeps its current lane_id.
+                id_ = (current_lane_index[2]
+                       if current_lane_index[2] < len(self.graph[current_lane_index[0]][current_lane_index[1]]) else 0)
+                lane_index = (lane_index[0], lane_index[1], id_)
+            lane = self.get_lane(lane_index)
+            on_lane = pending if k == len(route) - 1 else pending & ~(longitudinals > lane.length)
+            for i in np.flatnonzero(on_lane):
+                positions[i] = lane.position(longitudinals[i], lateral)
+                headings[i] = lane.heading_at(longitudinals[i])
+            pending &= ~on_lane
+            if not pending.any():
+                break
+            longitudinals[pending] -= lane.length
+        return positions, headings
+
     def random_lane_index(self, np_random: np.random.RandomState) -> LaneIndex:
         _from = np_random.choice(list(self.graph.keys()))
         _to = np_random.choice(list(self.graph[_from].keys()))
@@ -302,10 +396,75 @@ class RoadNetwork(object):
         return graph_dict
 
 
+class _VersionedList(list):
+
+    """A list counting its modifications, so that indexes over its items can tell in O(1) when they are stale."""
+
+    version: int = 0
+    """ Number of modifications of the list. """
+
+    def _modified(self) -> None:
+        self.version += 1
+
+    def append(self, item) -> None:
+        super().append(item)
+        self._modified()
+
+    def extend(self, items) -> None:
+        super().extend(items)
+        self._modified()
+
+    def insert(self, index, item) -> None:
+        super().insert(index, item)
+        self._modified()
+
+    def remove(self, item) -> None:
+        super().remove(item)
+        self._modified()
+
+    def pop(self, index=-1):
+        item = super().pop(index)
+        self._modified()
+        return item
+
+    def clear(self) -> None:
+        super().clear()
+        self._modified()
+
+    def sort(self, *args, **kwargs) -> None:
+        super().sort(*args, **kwargs)
+        self._modified()
+
+    def reverse(self) -> None:
+        super().reverse()
+        self._modified()
+
+    def __setitem__(self, index, item) -> None:
+        super().__setitem__(index, item)
+        self._modified()
+
+    def __delitem__(self, index) -> None:
+        super().__delitem__(index)
+        self._modified()
+
+    def __iadd__(self, items):
+        result = super().__iadd__(items)
+        self._modified()
+        return result
+
+    def __imul__(self, n):
+        result = super().__imul__(n)
+        self._modified()
+        return result
+
+
 class Road(object):
 
     """A road is a set of lanes, and a set of vehicles driving on these lanes."""
 
+    COLLISION_MARGIN: float = 1e-6
+    """ Slack added to the bounds of the collision broad phase to absorb rounding errors [m]. """
+
     def __init__(self,
                  network: RoadNetwork = None,
                  vehicles: List['kinematics.Vehicle'] = None,
@@ -321,11 +480,36 @@ class Road(object):
         :param np.random.RandomState np_random: a random number generator for vehicle behaviour
         :param record_history: whether the recent trajectories of vehicles should be recorded for display
         """
+        self._members_version = 0  # Incremented when the lists of vehicles or objects are replaced
+        self._lane_occupancy_index = {}
+        self._lane_occupancy_version = None
         self.network = network
         self.vehicles = vehicles or []
         self.objects = road_objects or []
         self.np_random = np_random if np_random else np.random.RandomState()
         self.record_history = record_history
+        self.vectorized_kinematics = None  # An optional VectorizedKinematics core, to step all vehicles at once
+        self.vectorized_behavior = None  # An optional VectorizedBehavior kernel, to decide all IDM actions at once
+
+    @property
+    def vehicles(self) -> List['kinematics.Vehicle']:
+        """The vehicles driving on the road, in a list whose modifications invalidate the lane occupancy index."""
+        return self._vehicles
+
+    @vehicles.setter
+    def vehicles(self, vehicles: List['kinematics.Vehicle']) -> None:
+        self._vehicles = _VersionedList(vehicles)
+        self._members_version += 1
+
+    @property
+    def objects(self) -> List['objects.RoadObject']:
+        """The objects on the road, in a list whose modifications invalidate the lane occupancy index."""
+        return self._objects
+
+    @objects.setter
+    def objects(self, road_objects: List['objects.RoadObject']) -> None:
+        self._objects = _VersionedList(road_objects)
+        self._members_version += 1
 
     def close_objects_to(self, vehicle: 'kinematics.Vehicle', distance: float, count: Optional[int] = None,
                          see_behind: bool = True, sort: bool = True, vehicles_only: bool = False) -> object:
@@ -351,8 +535,11 @@ class Road(object):
 
     def act(self) -> None:
         """Decide the actions of each entity on the road."""
-        for vehicle in self.vehicles:
-            vehicle.act()
+        if self.vectorized_behavior is not None:
+            self.vectorized_behavior.act(self.vehicles)
+        else:
+            for vehicle in self.vehicles:
+                vehicle.act()
 
     def step(self, dt: float) -> None:
         """
@@ -360,13 +547,48 @@ class Road(object):
 
         :param dt: timestep [s]
         """
-        for vehicle in self.vehicles:
-            vehicle.step(dt)
-        for i, vehicle in enumerate(self.vehicles):
-            for other in self.vehicles[i+1:]:
-                vehicle.handle_collisions(other, dt)
-            for other in self.objects:
-                vehicle.handle_collisions(other, dt)
+        if self.vectorized_kinematics is not None:
+            self.vectorized_kinematics.step(self.vehicles, dt)
+        else:
+            for vehicle in self.vehicles:
+                vehicle.step(dt)
+        self._lane_occupancy_index.clear()
+        for vehicle, other in self.collision_candidates(dt):
+            vehicle.handle_collisions(other, dt)
+
+    def collision_candidates(self, dt: float) -> List[Tuple['kinematics.Vehicle', 'objects.RoadObject']]:
+        """
+        Find the pairs of entities that may collide within a timestep, with a sweep and prune along the x axis.
+
+        Each entity is bounded by a disk covering its footprint and its motion during dt, so that every pair passing
+        the spherical pre-check of RoadObject.handle_collisions is kept. The pairs are ordered as in an exhaustive loop
+        over vehicles, then over the following vehicles and the objects.
+
+        :param dt: timestep [s]
+        :return: the list of (vehicle, other) candidate pairs
+        """
+        entities = self.vehicles + self.objects
+        if len(entities) < 2 or not self.vehicles:
+            return []
+        x = np.array([entity.position[0] for entity in entities], dtype=float)
+        radius = np.array([entity.diagonal / 2 + max(entity.speed * dt, 0) for entity in entities], dtype=float) \
+            + self.COLLISION_MARGIN
+        lower, upper = x - radius, x + radius
+        undefined = ~(np.isfinite(lower) & np.isfinite(upper))
+        lower[undefined], upper[undefined] = -np.inf, np.inf
+        order = np.argsort(lower, kind="stable")
+        lower, upper = lower[order].tolist(), upper[order].tolist()
+        n_vehicles = len(self.vehicles)
+        pairs = []
+        for k, i in enumerate(order.tolist()):
+            for q in range(k + 1, len(order)):
+                if lower[q] > upper[k]:
+                    break
+                pair = min(i, int(order[q])), max(i, int(order[q]))
+                if pair[0] < n_vehicles:
+                    pairs.append(pair)
+        pairs.sort()
+        return [(entities[i], entities[j]) for i, j in pairs]
 
     def neighbour_vehicles(self, vehicle: 'kinematics.Vehicle', lane_index: LaneIndex = None) \
             -> Tuple[Optional['kinematics.Vehicle'], Optional['kinematics.Vehicle']]:
@@ -383,22 +605,49 @@ class Road(object):
         if not lane_index:
             return None, None
         lane = self.network.get_lane(lane_index)
-        s = self.network.get_lane(lane_index).local_coordinates(vehicle.position)[0]
-        s_front = s_rear = None
+        s = lane.local_coordinates(vehicle.position)[0]
+        longitudinals, occupants = self.lane_occupancy(lane)
+        # Ties are resolved as in a linear scan over vehicles + objects: the last preceding and the first following
+        # object in that order are returned.
         v_front = v_rear = None
-        for v in self.vehicles + self.objects:
-            if v is not vehicle and not isinstance(v, Landmark):  # self.network.is_connected_road(v.lane_index,
-                # lane_index, same_lane=True):
-                s_v, lat_v = lane.local_coordinates(v.position)
-                if not lane.on_lane(v.position, s_v, lat_v, margin=1):
-                    continue
-                if s <= s_v and (s_front is None or s_v <= s_front):
-                    s_front = s_v
-                    v_front = v
-                if s_v < s and (s_rear is None or s_v > s_rear):
-                    s_rear = s_v
-                    v_rear = v
+        i = bisect.bisect_left(longitudinals, s)
+        while i < len(occupants) and occupants[i] is vehicle:
+            i += 1
+        if i < len(occupants):
+            j = bisect.bisect_right(longitudinals, longitudinals[i]) - 1
+            while occupants[j] is vehicle:
+                j -= 1
+            v_front = occupants[j]
+        k = bisect.bisect_left(longitudinals, s) - 1
+        if k >= 0:
+            v_rear = occupants[bisect.bisect_left(longitudinals, longitudinals[k])]
         return v_front, v_rear
 
+    def lane_occupancy(self, lane: AbstractLane) -> Tuple[List[float], List['objects.RoadObject']]:
+        """
+        Get the objects lying on a lane, sorted by their longitudinal coordinate along it.
+
+        The index of a lane is built at its first query after a step of the road, and invalidated when the road is
+        stepped or when vehicles or objects are added to or removed from the road, as tracked by version counters.
+
+        :param lane: the lane on which to look for objects
+        :return: the sorted longitudinal coordinates, and the corresponding objects
+        """
+        version = (self._members_version, self._vehicles.version, self._objects.version)
+        if version != self._lane_occupancy_version:
+            self._lane_occupancy_index.clear()
+            self._lane_occupancy_version = version
+        if lane not in self._lane_occupancy_index:
+            occupancy = []
+            for v in self._vehicles + self._objects:
+                if isinstance(v, Landmark):
+                    continue
+                s_v, lat_v = lane.local_coordinates(v.position)
+                if lane.on_lane(v.position, s_v, lat_v, margin=1):
+                    occupancy.append((s_v, v))
+            occupancy.sort(key=lambda o: o[0])  # Stable: preserves the road order of ties
+            self._lane_occupancy_index[lane] = ([o[0] for o in occupancy], [o[1] for o in occupancy])
+        return self._lane_occupancy_index[lane]
+
     def __repr__(self):
         return self.vehicles.__repr__()
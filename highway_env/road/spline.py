@@ -1,5 +1,4 @@
 import numpy as np
-from scipy import interpolate
 from typing import List, Tuple
 
 
@@ -21,6 +20,7 @@ class LinearSpline2D:
             (0, np.cumsum(np.sqrt(x_values_diff[:-1] ** 2 + y_values_diff[:-1] ** 2)))
         )
         self.length = arc_length_cumulated[-1]
+        from scipy import interpolate
         self.x_curve = interpolate.interp1d(
             arc_length_cumulated, x_values, fill_value="extrapolate"
         )
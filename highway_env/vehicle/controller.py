@@ -1,7 +1,6 @@
 from typing import List, Tuple, Union, Optional
 
 import numpy as np
-import copy
 from highway_env import utils
 from highway_env.road.road import Road, LaneIndex, Route
 from highway_env.utils import Vector
@@ -187,7 +186,7 @@ class ControlledVehicle(Vehicle):
                 _to = self.road.np_random.randint(len(routes))
             self.route = routes[_to % len(routes)]
 
-    def predict_trajectory_constant_speed(self, times: np.ndarray) -> Tuple[List[np.ndarray], List[float]]:
+    def predict_trajectory_constant_speed(self, times: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         """
         Predict the future positions of the vehicle along its planned route, under constant speed
 
@@ -196,12 +195,15 @@ class ControlledVehicle(Vehicle):
         """
         coordinates = self.lane.local_coordinates(self.position)
         route = self.route or [self.lane_index]
-        pos_heads = [self.road.network.position_heading_along_route(route,
-                                                                    coordinates[0] + self.speed * t,
-                                                                    0,
-                                                                    self.lane_index)
-                     for t in times]
-        return tuple(zip(*pos_heads))
+        return self.road.network.positions_headings_along_route(route,
+                                                                coordinates[0] + self.speed * np.asarray(times),
+                                                                0,
+                                                                self.lane_index)
+
+    def copy_for_prediction(self) -> "ControlledVehicle":
+        v = super().copy_for_prediction()
+        v.route = list(self.route) if self.route is not None else None
+        return v
 
 
 class MDPVehicle(ControlledVehicle):
@@ -306,7 +308,7 @@ class MDPVehicle(ControlledVehicle):
         :return: the sequence of future states
         """
         states = []
-        v = copy.deepcopy(self)
+        v = self.copy_for_prediction()
         t = 0
         for action in actions:
             v.act(action)  # High-level decision
@@ -315,5 +317,5 @@ class MDPVehicle(ControlledVehicle):
                 v.act()  # Low-level control action
                 v.step(dt)
                 if (t % int(trajectory_timestep / dt)) == 0:
-                    states.append(copy.deepcopy(v))
+                    states.append(v.copy_for_prediction())
         return states
@@ -1,4 +1,3 @@
-import itertools
 from typing import List, Tuple, TYPE_CHECKING
 
 import numpy as np
@@ -29,7 +28,11 @@ class VehicleGraphics(object):
                 transparent: bool = False,
                 offscreen: bool = False,
                 label: bool = False,
-                draw_roof: bool = False) -> None:
+                draw_roof: bool = False,
+                position: Vector = None,
+                heading: float = None,
+                crashed: bool = None,
+                steering: float = None) -> None:
         """
         Display a vehicle on a pygame surface.
 
@@ -40,8 +43,14 @@ class VehicleGraphics(object):
         :param transparent: whether the vehicle should be drawn slightly transparent
         :param offscreen: whether the rendering should be done offscreen or not
         :param label: whether a text label should be rendered
+        :param position: the position at which to draw the vehicle, if not its current position
+        :param heading: the heading with which to draw the vehicle, if not its current heading
+        :param crashed: whether to draw the vehicle as crashed, if not its current crash state
+        :param steering: the steering angle of the drawn front tires, if not its current steering
         """
-        if not surface.is_visible(vehicle.position):
+        position = vehicle.position if position is None else position
+        heading = vehicle.heading if heading is None else heading
+        if not surface.is_visible(position):
             return
 
         v = vehicle
@@ -65,7 +74,7 @@ class VehicleGraphics(object):
                                 surface.pix(length / 2 + (0.6*v.WIDTH) / 5),
                                 surface.pix(headlight_length),
                                 surface.pix(headlight_width))
-        color = cls.get_color(v, transparent)
+        color = cls.get_color(v, transparent, crashed)
         pygame.draw.rect(vehicle_surface, color, rect, 0)
         pygame.draw.rect(vehicle_surface, cls.lighten(color), rect_headlight_left, 0)
         pygame.draw.rect(vehicle_surface, cls.lighten(color), rect_headlight_right, 0)
@@ -83,7 +92,8 @@ class VehicleGraphics(object):
                               [surface.pix(tire_length), surface.pix(length / 2 + v.WIDTH / 2)],
                               [surface.pix(length - tire_length), surface.pix(length / 2 - v.WIDTH / 2)],
                               [surface.pix(length - tire_length), surface.pix(length / 2 + v.WIDTH / 2)]]
-            tire_angles = [0, 0, v.action["steering"], v.action["steering"]]
+            steering = v.action["steering"] if steering is None else steering
+            tire_angles = [0, 0, steering, steering]
             for tire_position, tire_angle in zip(tire_positions, tire_angles):
                 tire_surface = pygame.Surface((surface.pix(tire_length), surface.pix(tire_length)), pygame.SRCALPHA)
                 rect = (0, surface.pix(tire_length/2-tire_width/2), surface.pix(tire_length), surface.pix(tire_width))
@@ -91,8 +101,8 @@ class VehicleGraphics(object):
                 cls.blit_rotate(vehicle_surface, tire_surface, tire_position, np.rad2deg(-tire_angle))
 
         # Centered rotation
-        h = v.heading if abs(v.heading) > 2 * np.pi / 180 else 0
-        position = [*surface.pos2pix(v.position[0], v.position[1])]
+        h = heading if abs(heading) > 2 * np.pi / 180 else 0
+        position = [*surface.pos2pix(position[0], position[1])]
         if not offscreen:
             # convert_alpha throws errors in offscreen mode
             # see https://stackoverflow.com/a/19057853
@@ -152,25 +162,24 @@ class VehicleGraphics(object):
         """
         Display the whole trajectory of a vehicle on a pygame surface.
 
-        :param vehicle: the vehicle states within the trajectory to be displayed
-        :param surface: the surface to draw the vehicle future states on
+        :param vehicle: the vehicle whose recorded states are to be displayed
+        :param surface: the surface to draw the vehicle past states on
         :param frequency: frequency of displayed positions in history
         :param duration: length of displayed history
         :param simulation: simulation frequency
         :param offscreen: whether the rendering should be done offscreen or not
         """
-        for v in itertools.islice(vehicle.history,
-                                  None,
-                                  int(simulation * duration),
-                                  int(simulation / frequency)):
-            cls.display(v, surface, transparent=True, offscreen=offscreen)
+        # Past states are drawn uncrashed and with straight tires, as the history only records their kinematics
+        for x, y, heading, _ in vehicle.history[:int(simulation * duration):int(simulation / frequency)]:
+            cls.display(vehicle, surface, transparent=True, offscreen=offscreen, position=(x, y), heading=heading,
+                        crashed=False, steering=0)
 
     @classmethod
-    def get_color(cls, vehicle: Vehicle, transparent: bool = False) -> Tuple[int]:
+    def get_color(cls, vehicle: Vehicle, transparent: bool = False, crashed: bool = None) -> Tuple[int]:
         color = cls.DEFAULT_COLOR
         if getattr(vehicle, "color", None):
             color = vehicle.color
-        elif vehicle.crashed:
+        elif vehicle.crashed if crashed is None else crashed:
             color = cls.RED
         elif isinstance(vehicle, LinearVehicle):
             color = cls.YELLOW
@@ -1,7 +1,6 @@
 from typing import Union, Optional, Tuple, List
 import numpy as np
 import copy
-from collections import deque
 
 from highway_env import utils
 from highway_env.road.road import Road, LaneIndex
@@ -29,6 +28,8 @@ class Vehicle(RoadObject):
     """ Minimum reachable speed [m/s] """
     HISTORY_SIZE = 30
     """ Length of the vehicle state history, for trajectory display"""
+    HISTORY_FEATURES = ['x', 'y', 'heading', 'speed']
+    """ Features of the vehicle states stored in the history """
 
     def __init__(self,
                  road: Road,
@@ -42,7 +43,8 @@ class Vehicle(RoadObject):
         self.crashed = False
         self.impact = None
         self.log = []
-        self.history = deque(maxlen=self.HISTORY_SIZE)
+        self._history = np.zeros((self.HISTORY_SIZE, len(self.HISTORY_FEATURES)))
+        self._history_count = 0
 
     @classmethod
     def create_random(cls, road: Road,
@@ -144,12 +146,40 @@ class Vehicle(RoadObject):
 
     def on_state_update(self) -> None:
         if self.road:
-            self.lane_index = self.road.network.get_closest_lane_index(self.position, self.heading)
+            self.lane_index = self.road.network.get_closest_lane_index(self.position, self.heading,
+                                                                         self.lane_index)
             self.lane = self.road.network.get_lane(self.lane_index)
             if self.road.record_history:
-                self.history.appendleft(self.create_from(self))
+                self.record_state()
 
-    def predict_trajectory_constant_speed(self, times: np.ndarray) -> Tuple[List[np.ndarray], List[float]]:
+    def record_state(self) -> None:
+        """Store the current state in the ring buffer of the vehicle history, overwriting the oldest state."""
+        row = self._history[self._history_count % self.HISTORY_SIZE]
+        row[0], row[1] = self.position
+        row[2], row[3] = self.heading, self.speed
+        self._history_count += 1
+
+    @property
+    def history(self) -> np.ndarray:
+        """
+        The recorded states of the vehicle, from the most recent to the oldest.
+
+        :return: an array of shape (n, 4) with features [x, y, heading, speed]
+        """
+        count = min(self._history_count, self.HISTORY_SIZE)
+        return self._history[(self._history_count - 1 - np.arange(count)) % self.HISTORY_SIZE]
+
+    def predict_trajectory_constant_speed(self, times: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Predict the future positions of the vehicle, under constant speed and steering.
+
+        The integration scheme of Vehicle.step is unrolled into cumulative sums over all timesteps at once. Crashed
+        vehicles, vehicles with a pending impact or out of their speed range, and vehicles with custom dynamics are
+        still stepped, on a copy sharing the road of the vehicle.
+
+        :param times: timesteps of prediction
+        :return: positions, headings
+        """
         if self.prediction_type == 'zero_steering':
             action = {'acceleration': 0.0, 'steering': 0.0}
         elif self.prediction_type == 'constant_steering':
@@ -158,16 +188,43 @@ class Vehicle(RoadObject):
             raise ValueError("Unknown predition type")
 
         dt = np.diff(np.concatenate(([0.0], times)))
+        if type(self).step is not Vehicle.step or type(self).clip_actions is not Vehicle.clip_actions \
+                or type(self).act is not Vehicle.act or self.crashed or self.impact is not None \
+                or not self.MIN_SPEED <= self.speed <= self.MAX_SPEED:
+            positions = []
+            headings = []
+            v = self.copy_for_prediction()
+            v.act(action)
+            for t in dt:
+                v.step(t)
+                positions.append(v.position.copy())
+                headings.append(v.heading)
+            return np.array(positions).reshape(-1, 2), np.array(headings)
+
+        beta = np.arctan(1 / 2 * np.tan(action['steering']))
+        headings = np.cumsum(np.concatenate(([self.heading], self.speed * np.sin(beta) / (self.LENGTH / 2) * dt)))
+        velocities = self.speed * np.array([np.cos(headings[:-1] + beta), np.sin(headings[:-1] + beta)]).T
+        positions = np.cumsum(np.concatenate(([self.position], velocities * dt[:, np.newaxis])), axis=0)
+        return positions[1:], headings[1:]
+
+    def copy_for_prediction(self) -> "Vehicle":
+        """
+        Copy the vehicle so that it can be stepped without affecting the simulation.
 
-        positions = []
-        headings = []
-        v = copy.deepcopy(self)
-        v.act(action)
-        for t in dt:
-            v.step(t)
-            positions.append(v.position.copy())
-            headings.append(v.heading)
-        return (positions, headings)
+        Unlike a deep copy, the road network and the other vehicles are shared rather than copied. Only the road
+        random generator is copied, so that predictions do not consume random numbers of the simulation.
+
+        :return: a copy of the vehicle, on a shallow copy of its road
+        """
+        v = copy.copy(self)
+        if self.road:
+            v.road = copy.copy(self.road)
+            v.road.np_random = copy.deepcopy(self.road.np_random)
+        v.position = self.position.copy()
+        v.action = dict(self.action)
+        v.log = []
+        v._history = self._history.copy()
+        return v
 
     @property
     def velocity(self) -> np.ndarray:
@@ -200,20 +257,22 @@ class Vehicle(RoadObject):
             return np.zeros((3,))
 
     def to_dict(self, origin_vehicle: "Vehicle" = None, observe_intentions: bool = True) -> dict:
+        velocity, direction = self.velocity, self.direction
+        destination_direction, lane_offset = self.destination_direction, self.lane_offset
         d = {
             'presence': 1,
             'x': self.position[0],
             'y': self.position[1],
-            'vx': self.velocity[0],
-            'vy': self.velocity[1],
+            'vx': velocity[0],
+            'vy': velocity[1],
             'heading': self.heading,
-            'cos_h': self.direction[0],
-            'sin_h': self.direction[1],
-            'cos_d': self.destination_direction[0],
-            'sin_d': self.destination_direction[1],
-            'long_off': self.lane_offset[0],
-            'lat_off': self.lane_offset[1],
-            'ang_off': self.lane_offset[2],
+            'cos_h': direction[0],
+            'sin_h': direction[1],
+            'cos_d': destination_direction[0],
+            'sin_d': destination_direction[1],
+            'long_off': lane_offset[0],
+            'lat_off': lane_offset[1],
+            'ang_off': lane_offset[2],
         }
         if not observe_intentions:
             d["cos_d"] = d["sin_d"] = 0
@@ -0,0 +1,331 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from highway_env.road.road import LaneIndex
+from highway_env.vehicle.behavior import IDMVehicle
+from highway_env.vehicle.controller import ControlledVehicle
+from highway_env.vehicle.kinematics import Vehicle
+from highway_env.vehicle.objects import RoadObject
+
+
+class VectorizedKinematics(object):
+
+    """
+    A struct-of-arrays core integrating the kinematic bicycle model of many vehicles at once.
+
+    The state of the supported vehicles (position, heading, speed, steering and acceleration) is held in contiguous
+    arrays, and each vehicle position is a view on a row of the position array. A step performs the same operations as
+    Vehicle.step, in the same order, so the resulting states are identical to those of a per-vehicle integration.
+
+    Vehicles with other dynamics or action clipping, such as BicycleVehicle, are stepped individually.
+    """
+
+    SUPPORTED_STEPS = {Vehicle.step: False, IDMVehicle.step: True}
+    """ Step methods which can be vectorised, mapped to whether they increment the vehicle timer before integrating """
+
+    def __init__(self) -> None:
+        self.vehicles: List[Vehicle] = []
+        self.position = np.zeros((0, 2))
+        self.heading = np.zeros(0)
+        self.speed = np.zeros(0)
+        self.steering = np.zeros(0)
+        self.acceleration = np.zeros(0)
+        self.length = np.zeros(0)
+        self.min_speed = np.zeros(0)
+        self.max_speed = np.zeros(0)
+        self.timed = np.zeros(0, dtype=bool)
+
+    @classmethod
+    def is_supported(cls, vehicle: Vehicle) -> bool:
+        """Whether the dynamics of a vehicle can be integrated by the vectorised core."""
+        return isinstance(vehicle, Vehicle) \
+            and type(vehicle).step in cls.SUPPORTED_STEPS \
+            and type(vehicle).clip_actions is Vehicle.clip_actions \
+            and type(vehicle).on_state_update is Vehicle.on_state_update
+
+    def attach(self, vehicles: List[Vehicle]) -> None:
+        """
+        Allocate the arrays for a set of vehicles, and make their positions views onto the position array.
+
+        :param vehicles: the supported vehicles to integrate
+        """
+        self.vehicles = list(vehicles)
+        self.position = np.array([v.position for v in self.vehicles], dtype=float).reshape(-1, 2)
+        self.length = np.array([v.LENGTH for v in self.vehicles], dtype=float)
+        self.min_speed = np.array([v.MIN_SPEED for v in self.vehicles], dtype=float)
+        self.max_speed = np.array([v.MAX_SPEED for v in self.vehicles], dtype=float)
+        self.timed = np.array([self.SUPPORTED_STEPS[type(v).step] for v in self.vehicles], dtype=bool)
+        for i, v in enumerate(self.vehicles):
+            v.position = self.position[i]
+
+    def gather(self) -> None:
+        """Read the state and actions of the vehicles, which may have been changed outside of the core."""
+        for i, v in enumerate(self.vehicles):
+            if v.position.base is not self.position:  # The position was replaced, restore the view
+                self.position[i] = v.position
+                v.position = self.position[i]
+        self.heading = np.array([v.heading for v in self.vehicles], dtype=float)
+        self.speed = np.array([v.speed for v in self.vehicles], dtype=float)
+        self.steering = np.array([v.action['steering'] for v in self.vehicles], dtype=float)
+        self.acceleration = np.array([v.action['acceleration'] for v in self.vehicles], dtype=float)
+
+    def step(self, vehicles: List[Vehicle], dt: float) -> None:
+        """
+        Step the dynamics of a list of vehicles.
+
+        :param vehicles: the vehicles to step
+        :param dt: timestep of integration of the model [s]
+        """
+        supported = [v for v in vehicles if self.is_supported(v)]
+        if len(supported) != len(self.vehicles) or any(v is not w for v, w in zip(supported, self.vehicles)):
+            self.attach(supported)
+        for vehicle in vehicles:
+            if not self.is_supported(vehicle):
+                vehicle.step(dt)
+        if not self.vehicles:
+            return
+        self.gather()
+        crashed = np.array([v.crashed for v in self.vehicles], dtype=bool)
+        impacted = np.array([v.impact is not None for v in self.vehicles], dtype=bool)
+
+        # Vehicle.clip_actions
+        self.steering[crashed] = 0
+        self.acceleration[crashed] = -1.0 * self.speed[crashed]
+        too_fast, too_slow = self.speed > self.max_speed, self.speed < self.min_speed
+        limit = 1.0 * (self.max_speed - self.speed)
+        self.acceleration = np.where(too_fast & (limit < self.acceleration), limit, self.acceleration)
+        limit = 1.0 * (self.min_speed - self.speed)
+        self.acceleration = np.where(~too_fast & too_slow & (limit > self.acceleration), limit, self.acceleration)
+
+        # Vehicle.step
+        beta = np.arctan(1 / 2 * np.tan(self.steering))
+        self.position += (self.speed * np.array([np.cos(self.heading + beta),
+                                                 np.sin(self.heading + beta)])).T * dt
+        for i in np.flatnonzero(impacted):
+            self.position[i] += self.vehicles[i].impact
+        self.heading += self.speed * np.sin(beta) / (self.length / 2) * dt
+        self.speed += self.acceleration * dt
+
+        for i, v in enumerate(self.vehicles):
+            if self.timed[i]:
+                v.timer += dt
+            v.action['steering'] = float(self.steering[i])
+            v.action['acceleration'] = float(self.acceleration[i])
+            v.heading = self.heading[i]
+            v.speed = self.speed[i]
+            if impacted[i]:
+                v.crashed = True
+                v.impact = None
+            v.on_state_update()
+
+
+def not_zero(x: np.ndarray, eps: float = 1e-2) -> np.ndarray:
+    """Element-wise version of utils.not_zero."""
+    return np.where(np.abs(x) > eps, x, np.where(x >= 0, eps, -eps))
+
+
+def wrap_to_pi(x: np.ndarray) -> np.ndarray:
+    """Element-wise version of utils.wrap_to_pi."""
+    return ((x + np.pi) % (2 * np.pi)) - np.pi
+
+
+class VectorizedBehavior(object):
+
+    """
+    A batched kernel computing the IDM and MOBIL decisions of many IDM vehicles at once.
+
+    Road.act lets each vehicle decide in turn, and a vehicle may observe the lane changes decided by the previous ones.
+    The lateral decisions are thus still applied in the order of the vehicles, but the MOBIL criteria of every vehicle
+    about to consider a lane change are evaluated together beforehand. The steering and IDM accelerations are then
+    computed for all vehicles at once, with the same operations as IDMVehicle.act, so the resulting actions are
+    identical to those of a per-vehicle decision.
+
+    Vehicles with other decision models, such as LinearVehicle, act individually.
+    """
+
+    SUPPORTED_METHODS = [(IDMVehicle, ['act', 'acceleration', 'desired_gap', 'change_lane_policy', 'mobil']),
+                         (ControlledVehicle, ['follow_road', 'steering_control'])]
+    """ Decision methods which can be batched, with the classes defining them """
+
+    @classmethod
+    def is_supported(cls, vehicle: RoadObject) -> bool:
+        """Whether the decisions of a vehicle can be computed by the batched kernel."""
+        return isinstance(vehicle, IDMVehicle) and all(getattr(type(vehicle), method) is getattr(base, method)
+                                                       for base, methods in cls.SUPPORTED_METHODS
+                                                       for method in methods)
+
+    def act(self, vehicles: List[RoadObject]) -> None:
+        """
+        Decide the actions of a list of vehicles.
+
+        :param vehicles: the vehicles on the road, in their order of decision
+        """
+        supported = [v for v in vehicles if self.is_supported(v) and not v.crashed]
+        if not supported:
+            for vehicle in vehicles:
+                vehicle.act()
+            return
+        supported_ids = {id(v) for v in supported}
+        lane_changes = self.lane_change_decisions(supported)
+        for vehicle in vehicles:
+            if id(vehicle) not in supported_ids:
+                # The MOBIL criteria depend on target speeds, which custom vehicles may change when acting
+                target_speed = getattr(vehicle, "target_speed", None)
+                vehicle.act()
+                if getattr(vehicle, "target_speed", None) != target_speed:
+                    lane_changes.clear()
+                continue
+            vehicle.follow_road()
+            if vehicle.enable_lane_change:
+                if id(vehicle) in lane_changes and vehicle.lane_index == vehicle.target_lane_index:
+                    vehicle.timer = 0
+                    vehicle.target_lane_index = lane_changes[id(vehicle)]
+                else:
+                    vehicle.change_lane_policy()
+        self.control(supported)
+
+    def lane_change_decisions(self, vehicles: List[IDMVehicle]) -> Dict[int, LaneIndex]:
+        """
+        Evaluate the lane changes of the vehicles whose policy is due to consider one.
+
+        Only vehicles which keep their lane, have no lane imposed by their route, and whose decision timer has expired
+        are evaluated, the others are left to IDMVehicle.change_lane_policy.
+
+        :param vehicles: the supported vehicles
+        :return: the target lane index decided by each evaluated vehicle, indexed by vehicle id
+        """
+        decisions = {}
+        candidates = []
+        for v in vehicles:
+            network = v.road.network
+            if not v.enable_lane_change \
+                    or v.lane_index != v.target_lane_index \
+                    or (v.route and v.route[0][2] is not None) \
+                    or not v.LANE_CHANGE_DELAY < v.timer \
+                    or network.get_lane(v.target_lane_index).after_end(v.position):
+                continue
+            decisions[id(v)] = v.target_lane_index
+            if np.abs(v.speed) < 1:
+                continue
+            for lane_index in network.side_lanes(v.lane_index):
+                if network.get_lane(lane_index).is_reachable_from(v.position):
+                    candidates.append((v, lane_index))
+        if not candidates:
+            return decisions
+
+        queries = []
+        for v, lane_index in candidates:
+            new_preceding, new_following = v.road.neighbour_vehicles(v, lane_index)
+            old_preceding, old_following = v.road.neighbour_vehicles(v)
+            queries.extend([(v, new_following, new_preceding),
+                            (v, new_following, v),
+                            (v, v, new_preceding),
+                            (v, v, old_preceding),
+                            (v, old_following, v),
+                            (v, old_following, old_preceding)])
+        new_following_a, new_following_pred_a, self_pred_a, self_a, old_following_a, old_following_pred_a = \
+            self.accelerations(queries).reshape(-1, 6).T
+        max_braking = np.array([v.LANE_CHANGE_MAX_BRAKING_IMPOSED for v, _ in candidates], dtype=float)
+        politeness = np.array([v.POLITENESS for v, _ in candidates], dtype=float)
+        min_gain = np.array([v.LANE_CHANGE_MIN_ACC_GAIN for v, _ in candidates], dtype=float)
+        jerk = self_pred_a - self_a + politeness * (new_following_pred_a - new_following_a
+                                                    + old_following_pred_a - old_following_a)
+        accepted = ~(new_following_pred_a < -max_braking) & ~(jerk < min_gain)
+        for (v, lane_index), accept in zip(candidates, accepted):
+            if accept:
+                decisions[id(v)] = lane_index
+        return decisions
+
+    def control(self, vehicles: List[IDMVehicle]) -> None:
+        """
+        Compute and store the steering and acceleration commands of vehicles, whose target lanes are decided.
+
+        :param vehicles: the supported vehicles
+        """
+        # ControlledVehicle.steering_control
+        speed = np.array([v.speed for v in vehicles], dtype=float)
+        heading = np.array([v.heading for v in vehicles], dtype=float)
+        kp_lateral = np.array([v.KP_LATERAL for v in vehicles], dtype=float)
+        kp_heading = np.array([v.KP_HEADING for v in vehicles], dtype=float)
+        length = np.array([v.LENGTH for v in vehicles], dtype=float)
+        max_steering = np.array([v.MAX_STEERING_ANGLE for v in vehicles], dtype=float)
+        lateral = np.zeros(len(vehicles))
+        lane_future_heading = np.zeros(len(vehicles))
+        for i, v in enumerate(vehicles):
+            target_lane = v.road.network.get_lane(v.target_lane_index)
+            lane_coords = target_lane.local_coordinates(v.position)
+            lateral[i] = lane_coords[1]
+            lane_future_heading[i] = target_lane.heading_at(lane_coords[0] + v.speed * v.TAU_PURSUIT)
+        lateral_speed_command = - kp_lateral * lateral
+        heading_command = np.arcsin(np.clip(lateral_speed_command / not_zero(speed), -1, 1))
+        heading_ref = lane_future_heading + np.clip(heading_command, -np.pi/4, np.pi/4)
+        heading_rate_command = kp_heading * wrap_to_pi(heading_ref - heading)
+        slip_angle = np.arcsin(np.clip(length / 2 / not_zero(speed) * heading_rate_command, -1, 1))
+        steering = np.arctan(2 * np.tan(slip_angle))
+        steering = np.clip(steering, -max_steering, max_steering)
+
+        # IDM, on the current lane and on the target lane when changing lane
+        queries = []
+        changing = []
+        for v in vehicles:
+            queries.append((v, v, v.road.neighbour_vehicles(v, v.lane_index)[0]))
+        for i, v in enumerate(vehicles):
+            if v.lane_index != v.target_lane_index:
+                queries.append((v, v, v.road.neighbour_vehicles(v, v.target_lane_index)[0]))
+                changing.append(i)
+        accelerations = self.accelerations(queries)
+        acceleration = accelerations[:len(vehicles)]
+        target_acceleration = accelerations[len(vehicles):]
+        acceleration[changing] = np.where(target_acceleration < acceleration[changing],
+                                          target_acceleration, acceleration[changing])
+        acc_max = np.array([v.ACC_MAX for v in vehicles], dtype=float)
+        acceleration = np.clip(acceleration, -acc_max, acc_max)
+
+        for i, v in enumerate(vehicles):
+            Vehicle.act(v, {'steering': steering[i], 'acceleration': acceleration[i]})
+
+    @staticmethod
+    def accelerations(queries: List[Tuple[IDMVehicle, Optional[RoadObject], Optional[RoadObject]]]) -> np.ndarray:
+        """
+        Compute IDM acceleration commands, as IDMVehicle.acceleration.
+
+        :param queries: a list of (vehicle, ego-vehicle, front vehicle) tuples, where the parameters of the IDM are
+                        those of the first vehicle
+        :return: the acceleration command of each ego-vehicle [m/s2]
+        """
+        accelerations = np.zeros(len(queries))
+        rows = [i for i, (_, ego, _) in enumerate(queries) if ego and isinstance(ego, Vehicle)]
+        if not rows:
+            return accelerations
+        owners = [queries[i][0] for i in rows]
+        egos = [queries[i][1] for i in rows]
+        fronts = [queries[i][2] for i in rows]
+        comfort_acc_max = np.array([v.COMFORT_ACC_MAX for v in owners], dtype=float)
+        comfort_acc_min = np.array([v.COMFORT_ACC_MIN for v in owners], dtype=float)
+        distance_wanted = np.array([v.DISTANCE_WANTED for v in owners], dtype=float)
+        time_wanted = np.array([v.TIME_WANTED for v in owners], dtype=float)
+        delta = np.array([v.DELTA for v in owners], dtype=float)
+        speed = np.array([v.speed for v in egos], dtype=float)
+        target_speed = np.array([getattr(v, "target_speed", 0) for v in egos], dtype=float)
+        speed_limit = np.array([v.lane.speed_limit if v.lane and v.lane.speed_limit is not None else np.nan
+                                for v in egos], dtype=float)
+
+        limited = ~np.isnan(speed_limit)
+        target_speed[limited] = np.clip(target_speed[limited], 0, speed_limit[limited])
+        acceleration = comfort_acc_max * (1 - np.power(
+            np.where(0 > speed, 0, speed) / np.abs(not_zero(target_speed)), delta))
+
+        k = [i for i, front in enumerate(fronts) if front]
+        if k:
+            d = np.array([egos[i].lane_distance_to(fronts[i]) for i in k], dtype=float)
+            ego_velocity = np.array([egos[i].velocity for i in k], dtype=float)
+            ego_direction = np.array([egos[i].direction for i in k], dtype=float)
+            front_velocity = np.array([fronts[i].velocity for i in k], dtype=float)
+            # IDMVehicle.desired_gap, with the dot products evaluated as matrix products
+            dv = np.matmul((ego_velocity - front_velocity)[:, np.newaxis, :], ego_direction[:, :, np.newaxis])[:, 0, 0]
+            ab = -comfort_acc_max[k] * comfort_acc_min[k]
+            d_star = distance_wanted[k] + speed[k] * time_wanted[k] + speed[k] * dv / (2 * np.sqrt(ab))
+            acceleration[k] -= comfort_acc_max[k] * np.power(d_star / not_zero(d), 2)
+        accelerations[rows] = acceleration
+        return accelerations
@@ -0,0 +1,42 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from argparse import Namespace
+
+parser = argparse.ArgumentParser(description="Measure the headless startup time of a worker: import highway_env and "
+                                             "make an environment, in a fresh interpreter")
+parser.add_argument('--env', type=str, default='dt-highway-v0')
+parser.add_argument('--repeat', type=int, default=5)
+parser.add_argument('--modules', type=str, nargs='+', default=['pygame', 'pandas', 'scipy', 'matplotlib'],
+                    help='heavy modules to report as loaded or not')
+
+args: Namespace = parser.parse_args()
+
+# Executed in a fresh interpreter, so that no module is already imported
+STARTUP = """
+import json, sys, time
+start = time.perf_counter()
+import gymnasium as gym
+import highway_env
+env = gym.make({env!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{'time': elapsed, 'loaded': [m for m in {modules!r} if m in sys.modules]}}))
+"""
+
+
+def measure() -> dict:
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    output = subprocess.run([sys.executable, '-c', STARTUP.format(env=args.env, modules=args.modules)],
+                            cwd=root, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+if __name__ == "__main__":
+    runs = [measure() for _ in range(args.repeat)]
+    times = [run['time'] for run in runs]
+    print(f"import highway_env; gym.make('{args.env}'): "
+          f"median {statistics.median(times):.3f}s, min {min(times):.3f}s over {args.repeat} runs")
+    print(f"Heavy modules loaded: {', '.join(runs[0]['loaded']) or 'none'}")
@@ -0,0 +1,52 @@
+import argparse
+import warnings
+from argparse import Namespace
+from multiprocessing import Pool
+
+from tqdm import tqdm
+
+# Import highway_env to register all environments
+import highway_env
+
+import projects.lampilot.utils as U
+from projects.lampilot.dt.dbl import DbLv1Dataset, CONTEXT_INDEX_FILE, sample_hash
+from projects.lampilot.evaluator import get_evaluator_class, DbLEvaluator
+
+warnings.simplefilter("ignore")
+
+parser = argparse.ArgumentParser(description="Precompute the context info of every sample of a DbL dataset")
+parser.add_argument('--config-root', type=str, default='projects/lampilot/configs/DbLv1')
+parser.add_argument('--num-process', type=int, default=1)
+parser.add_argument('--snapshot-dir', type=str, default='',
+                    help='directory sharing the post-warm-up snapshots across runs, e.g. ckpt/snapshots')
+
+args: Namespace = parser.parse_args()
+
+
+def compute_context(item):
+    sample_id, sample = item
+    evaluator_class = get_evaluator_class(sample['eval']['type'])
+    evaluator: DbLEvaluator = evaluator_class(
+        config=sample,
+        show_window=False,
+        snapshot_dir=args.snapshot_dir,
+    )
+    entry = {
+        'sample_hash': sample_hash(sample),
+        'context_info': evaluator.get_context_info(),
+        **evaluator.get_context_features(),
+    }
+    evaluator.close()
+    return sample_id, entry
+
+
+if __name__ == '__main__':
+    dataset = DbLv1Dataset(config_root=args.config_root)
+    samples = list(dataset.samples())
+
+    with Pool(args.num_process) as pool:
+        index = dict(tqdm(pool.imap_unordered(compute_context, samples), total=len(samples), desc="Computing contexts"))
+
+    index = {sample_id: index[sample_id] for sample_id, _ in samples}
+    U.dump_json(index, f"{args.config_root}/{CONTEXT_INDEX_FILE}", indent=4)
+    print(f"Context info of {len(index)} samples saved to {args.config_root}/{CONTEXT_INDEX_FILE}")
@@ -4,6 +4,7 @@ import re
 from langchain_openai import ChatOpenAI
 from langchain.prompts import SystemMessagePromptTemplate
 from langchain.schema import AIMessage, HumanMessage, SystemMessage, ChatMessage, BaseMessage
+from projects.lampilot.dt.llm_cache import LLMResponseCache
 from projects.lampilot.utils.io import load_prompt, load_apis
 
 
@@ -20,6 +21,7 @@ class CodeGenerationAgent:
                  temperature: float = 0.0,
                  request_timeout: int = 120,
                  zero_shot: bool = False,
+                 llm_cache: LLMResponseCache = None,
                  ):
         if model_name not in self.llms:
             raise RuntimeError(f"Unknown model name: {model_name}")
@@ -36,6 +38,7 @@ class CodeGenerationAgent:
             raise RuntimeError("Unknown LLM")
 
         self.zero_shot = zero_shot
+        self.llm_cache = llm_cache
 
     def render_system_message(self):
         system_template = load_prompt(f"cg_template_{'zs' if self.zero_shot else 'fs'}")
@@ -121,10 +124,26 @@ class CodeGenerationAgent:
 
     def step(self):
         if isinstance(self.llm, ChatOpenAI):
-            ai_message = self.llm(self.messages)
+            if self.llm_cache is not None:
+                ai_message = self.llm_cache.invoke(self.llm, self.messages)
+            else:
+                ai_message = self.llm(self.messages)
         else:
             raise RuntimeError("Unknown LLM")
+        return self.receive_ai_message(ai_message)
 
+    async def astep(self):
+        """Same as step, without blocking the event loop while waiting for the LLM."""
+        if isinstance(self.llm, ChatOpenAI):
+            if self.llm_cache is not None:
+                ai_message = await self.llm_cache.ainvoke(self.llm, self.messages)
+            else:
+                ai_message = await self.llm.ainvoke(self.messages)
+        else:
+            raise RuntimeError("Unknown LLM")
+        return self.receive_ai_message(ai_message)
+
+    def receive_ai_message(self, ai_message):
         if isinstance(ai_message, BaseMessage):
             ai_message = ai_message.content
         print(f"\033[34m****CG Agent ai message****\n{ai_message}\033[0m")
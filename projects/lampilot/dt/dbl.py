@@ -1,6 +1,16 @@
+import hashlib
 import json
+import os
+
 import numpy as np
 
+# Precomputed context info of the samples, written in the config root by build_context_index.py
+CONTEXT_INDEX_FILE = "context_index.json"
+
+
+def sample_hash(sample: dict) -> str:
+    return hashlib.sha1(json.dumps(sample, sort_keys=True).encode()).hexdigest()
+
 
 class DbLv1Dataset:
     def __init__(self,
@@ -20,20 +30,43 @@ class DbLv1Dataset:
                 'commands': config['commands'],
             })
 
+        self.context_index = self.load_context_index()
+
         self.data_items = []
         for config in self.configs:
             for sample_idx, sample in enumerate(config['samples']):
+                sample_id = f"{config['name'].split('.')[0]}_s{sample_idx}"
                 for command_idx, command in enumerate(config['commands']):
-                    self.data_items.append({
-                        'id': f"{config['name'].split('.')[0]}_s{sample_idx}_c{command_idx}",
+                    item = {
+                        'id': f"{sample_id}_c{command_idx}",
                         'sample': sample,
                         'command': command,
-                    })
+                    }
+                    if sample_id in self.context_index:
+                        item['context_info'] = self.context_index[sample_id]['context_info']
+                    self.data_items.append(item)
 
         if shuffle:
             np.random.seed(seed)
             self.data_items = np.random.permutation(self.data_items)
 
+    def samples(self):
+        for config in self.configs:
+            for sample_idx, sample in enumerate(config['samples']):
+                yield f"{config['name'].split('.')[0]}_s{sample_idx}", sample
+
+    def load_context_index(self) -> dict:
+        """Load the precomputed context of each sample, ignoring the entries of samples changed since."""
+        index_path = f"{self.config_root}/{CONTEXT_INDEX_FILE}"
+        if not os.path.exists(index_path):
+            return {}
+        index = json.load(open(index_path, 'r'))
+        return {
+            sample_id: index[sample_id]
+            for sample_id, sample in self.samples()
+            if sample_id in index and index[sample_id]['sample_hash'] == sample_hash(sample)
+        }
+
     def __len__(self):
         return len(self.data_items)
 
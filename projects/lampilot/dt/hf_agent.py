@@ -3,6 +3,7 @@ from langchain.schema import HumanMessage, SystemMessage
 
 from projects.lampilot.utils.io import load_prompt, load_apis, load_primitives
 from .cg_agent import CodeGenerationAgent
+from .llm_cache import LLMResponseCache
 from .policy_repo import PolicyRepository
 
 
@@ -16,11 +17,13 @@ class HumanFeedbackCGAgent(CodeGenerationAgent):
                  policy_repo_retrieval_top_k: int = 3,
                  ckpt_dir: str = "ckpt",
                  resume: bool = False,
+                 llm_cache: LLMResponseCache = None,
                  ):
         super().__init__(
             model_name=model_name,
             temperature=temperature,
             request_timeout=request_timeout,
+            llm_cache=llm_cache,
         )
 
         self.policy_repo = PolicyRepository(
@@ -30,6 +33,7 @@ class HumanFeedbackCGAgent(CodeGenerationAgent):
             request_timeout=request_timeout,
             ckpt_dir=ckpt_dir,
             resume=resume,
+            llm_cache=llm_cache,
         )
 
         # init variables
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import List, Optional
+
+
+class LLMResponseCache:
+    """
+    Persistent cache of LLM responses and text embeddings, indexed by a hash of the full request in an SQLite database.
+
+    The least recently used responses are evicted once their total size exceeds max_size. In replay mode the cache is
+    read-only, and a request without a cached response raises an error instead of reaching the network.
+    """
+
+    def __init__(self, cache_dir: str, max_size: int = 1 << 30, replay: bool = False):
+        self.max_size = max_size
+        self.replay = replay
+        path = f"{cache_dir}/responses.db"
+        if replay:
+            # Read-only, so that a shared or write-protected cache can be replayed, and a wrong path is not created
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No LLM response cache to replay at {path}.")
+            self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=60, isolation_level=None)
+            return
+        os.makedirs(cache_dir, exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS responses ("
+                                "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                                "size INTEGER NOT NULL, last_access REAL NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS last_access_index ON responses (last_access)")
+
+    @staticmethod
+    def key(model: str, temperature: float, messages: List) -> str:
+        request = json.dumps({
+            'model': model,
+            'temperature': temperature,
+            'messages': [[type(message).__name__, message.content] for message in messages],
+        })
+        return hashlib.sha256(request.encode()).hexdigest()
+
+    @staticmethod
+    def embedding_key(model: str, text: str) -> str:
+        request = json.dumps({
+            'embedding_model': model,
+            'text': text,
+        })
+        return hashlib.sha256(request.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        row = self.connection.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if not self.replay:
+            self.connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def put(self, key: str, response: str):
+        if self.replay:
+            return
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.execute("INSERT OR REPLACE INTO responses (key, response, size, last_access) "
+                                    "VALUES (?, ?, ?, ?)", (key, response, len(response.encode()), time.time()))
+            # Evict the least recently used responses beyond the size budget
+            self.connection.execute("DELETE FROM responses WHERE key IN ("
+                                    "SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY last_access DESC) AS total "
+                                    "FROM responses) WHERE total > ?)", (self.max_size,))
+
+    def _request_key(self, llm, messages: List) -> str:
+        return self.key(llm.model_name, llm.temperature, messages)
+
+    def invoke(self, llm, messages: List) -> str:
+        """
+        Get the response of an LLM to messages, from the cache if possible.
+
+        :param llm: the chat model
+        :param messages: the messages of the request
+        :return: the content of the response
+        """
+        key = self._request_key(llm, messages)
+        response = self.get(key)
+        if response is None:
+            if self.replay:
+                raise RuntimeError(f"No cached response for request {key} in replay mode.")
+            response = llm(messages).content
+            self.put(key, response)
+        return response
+
+    async def ainvoke(self, llm, messages: List) -> str:
+        """Same as invoke, without blocking the event loop while waiting for the LLM."""
+        key = self._request_key(llm, messages)
+        response = self.get(key)
+        if response is None:
+            if self.replay:
+                raise RuntimeError(f"No cached response for request {key} in replay mode.")
+            response = (await llm.ainvoke(messages)).content
+            self.put(key, response)
+        return response
+
+    def embed(self, embeddings, texts: List[str]) -> List[List[float]]:
+        """
+        Get the embedding vectors of texts, only requesting those of the texts missing from the cache.
+
+        :param embeddings: the embedding model
+        :param texts: the texts to embed
+        :return: the embedding vector of each text
+        """
+        model = getattr(embeddings, 'model', type(embeddings).__name__)
+        keys = [self.embedding_key(model, text) for text in texts]
+        vectors = [self.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            if self.replay:
+                raise RuntimeError(f"No cached embedding for {len(missing)} texts in replay mode.")
+            for i, vector in zip(missing, embeddings.embed_documents([texts[i] for i in missing])):
+                vectors[i] = json.dumps(vector)
+                self.put(keys[i], vectors[i])
+        return [json.loads(vector) for vector in vectors]
+
+    def close(self):
+        self.connection.close()
+
+
+class CachedEmbeddings:
+    """Embedding model whose vectors go through an LLMResponseCache, as embedding function of a vector store."""
+
+    def __init__(self, embeddings, cache: LLMResponseCache):
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.cache.embed(self.embeddings, texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.cache.embed(self.embeddings, [text])[0]
@@ -7,6 +7,7 @@ from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain.schema import HumanMessage, SystemMessage
 from langchain_community.vectorstores import Chroma
 
+from projects.lampilot.dt.llm_cache import CachedEmbeddings, LLMResponseCache
 from projects.lampilot.utils.io import load_primitives, load_json, load_prompt
 
 
@@ -18,7 +19,9 @@ class PolicyRepository:
                  request_timeout=120,
                  ckpt_dir="ckpt",
                  resume=False,
+                 llm_cache: LLMResponseCache = None,
                  ):
+        self.llm_cache = llm_cache
         self.llm = ChatOpenAI(
             model=model_name,
             temperature=temperature,
@@ -36,9 +39,12 @@ class PolicyRepository:
             self.policies = {}
         self.retrieve_top_k = retrieval_top_k
         self.ckpt_dir = ckpt_dir
+        embedding_function = OpenAIEmbeddings()
+        if llm_cache is not None:
+            embedding_function = CachedEmbeddings(embedding_function, llm_cache)
         self.vectordb = Chroma(
             collection_name="policy_vectordb",
-            embedding_function=OpenAIEmbeddings(),
+            embedding_function=embedding_function,
             persist_directory=f"{ckpt_dir}/policy/vectordb",
         )
         assert self.vectordb._collection.count() == len(self.policies), (
@@ -99,7 +105,10 @@ class PolicyRepository:
             SystemMessage(content=load_prompt("policy")),
             HumanMessage(content=program_code + "\n\n" + f"The main function is `{program_name}`."),
         ]
-        policy_description = f"{self.llm(messages).content}"
+        if self.llm_cache is not None:
+            policy_description = self.llm_cache.invoke(self.llm, messages)
+        else:
+            policy_description = f"{self.llm(messages).content}"
         return f"def {program_name}(ego):\n    {policy_description}"
 
     def retrieve_policies(self, query):
@@ -1,8 +1,9 @@
+import time
 from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
 from typing import List
 
 import numpy as np
-from langchain.pydantic_v1 import BaseModel, Field
 
 from highway_env.road.road import LaneIndex, Route
 from highway_env.utils import not_zero, wrap_to_pi
@@ -12,33 +13,34 @@ from highway_env.vehicle.kinematics import Vehicle
 from projects.lampilot.vehicle.objects import StopSign
 
 
-class VehicleConfig(BaseModel):
-    kp_a: float = Field(
-        description="longitudinal speed control gain",
-        default=ControlledVehicle.KP_A
+@dataclass
+class VehicleConfig:
+    kp_a: float = field(
+        default=ControlledVehicle.KP_A,
+        metadata={'description': "longitudinal speed control gain"}
     )
-    kp_lat: float = Field(
-        description="lateral position control gain",
-        default=ControlledVehicle.KP_LATERAL
+    kp_lat: float = field(
+        default=ControlledVehicle.KP_LATERAL,
+        metadata={'description': "lateral position control gain"}
     )
-    kp_psi: float = Field(
-        description="heading control gain",
-        default=ControlledVehicle.KP_HEADING
+    kp_psi: float = field(
+        default=ControlledVehicle.KP_HEADING,
+        metadata={'description': "heading control gain"}
     )
-    acceleration: float = Field(
-        description="IDM parameter in m/s^2; the desired maximum vehicle acceleration",
-        default=6.0)
-    comfortable_deceleration: float = Field(
-        description="IDM parameter in m/s^2; a positive number",
-        default=6.0)
-    acceleration_exponent: float = Field(description="IDM parameter", default=4.0)
-    desired_time_headway: float = Field(
-        description="IDM parameter in s; the minimum possible time to the vehicle in front",
-        default=1.5)  # 0.5
-    minimum_spacing: float = Field(
-        description="IDM parameter in m; a minimum desired net distance, "
-                    "a car can't move if the distance from the car in the front is not at least this value",
-        default=6.0)
+    acceleration: float = field(
+        default=6.0,
+        metadata={'description': "IDM parameter in m/s^2; the desired maximum vehicle acceleration"})
+    comfortable_deceleration: float = field(
+        default=6.0,
+        metadata={'description': "IDM parameter in m/s^2; a positive number"})
+    acceleration_exponent: float = field(default=4.0, metadata={'description': "IDM parameter"})
+    desired_time_headway: float = field(
+        default=1.5,  # 0.5
+        metadata={'description': "IDM parameter in s; the minimum possible time to the vehicle in front"})
+    minimum_spacing: float = field(
+        default=6.0,
+        metadata={'description': "IDM parameter in m; a minimum desired net distance, a car can't move "
+                                 "if the distance from the car in the front is not at least this value"})
 
 
 class VehicleDigitalTwin(ABC):
@@ -311,6 +313,8 @@ class CtrlVDT(IDMDT):
     def reset(self, ego_vehicle: Vehicle):
         super().reset(ego_vehicle)
         self.reset_policy()
+        # Wall time [s] spent in the ticks of the policy
+        self.policy_time = 0.
 
     def execute(self, code: dict):
         apis = [
@@ -366,6 +370,7 @@ class CtrlVDT(IDMDT):
         self.policy = iter([])
 
     def act(self) -> np.ndarray:
+        start = time.perf_counter()
         try:
             action = next(self.policy)
             if len(action) != 2:
@@ -377,6 +382,8 @@ class CtrlVDT(IDMDT):
             if "'NoneType' object is not an iterator" not in str(e):
                 print(f"\033[31m Error in act: {e} \033[0m")
             self.reset_policy()
+        finally:
+            self.policy_time += time.perf_counter() - start
         return self.autopilot()
 
     # ====== API ====== #
@@ -0,0 +1,53 @@
+import argparse
+import json
+import socket
+from argparse import Namespace
+from typing import Iterator
+
+parser = argparse.ArgumentParser(description="Evaluate a policy on a sample with a running eval_server.py")
+parser.add_argument('--socket', type=str, default='ckpt/eval_server.sock')
+parser.add_argument('--sample-id', type=str, default="", help='id of a sample of the dataset, e.g. left_lc_s0')
+parser.add_argument('--config', type=str, default="", help='configuration JSON file, whose first sample is evaluated')
+parser.add_argument('--policy', type=str, required=True,
+                    help='Python file of the policy, defining the generator `policy` with the APIs of the agent')
+parser.add_argument('--command', type=str, default="")
+parser.add_argument('--metrics-every', type=int, default=15, help='frames between two printed steps, 0 for none')
+
+args: Namespace = parser.parse_args()
+
+
+def submit(socket_path: str, job: dict) -> Iterator[dict]:
+    """Send a job to an evaluation server, and yield its events up to the result or error."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall((json.dumps(job) + "\n").encode())
+        with sock.makefile('r') as events:
+            for line in events:
+                event = json.loads(line)
+                yield event
+                if event['event'] in ("result", "error"):
+                    return
+
+
+if __name__ == "__main__":
+    job = {
+        'policy': {'reused_code': "", 'new_code': open(args.policy).read()},
+        'command': args.command,
+        'metrics_every': args.metrics_every,
+    }
+    if args.config:
+        job['sample'] = json.load(open(args.config))['samples'][0]
+    elif args.sample_id:
+        job['sample_id'] = args.sample_id
+    else:
+        raise ValueError("Either --sample-id or --config is required")
+
+    for event in submit(args.socket, job):
+        if event['event'] == "step":
+            print(f"t={event['time']:5.1f}s speed={event['speed']:5.1f} m/s "
+                  f"acceleration={event['acceleration']:5.2f} steering={event['steering']:5.2f} ttc={event['ttc']:.1f}")
+        elif event['event'] == "result":
+            print(f"Success: {event['success']}, collision: {event['collision']}, "
+                  f"termination: {event['termination']}, score: {event['overall_score']:.1f}")
+        else:
+            print(f"Error: {event['message']}")
@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+import socketserver
+import traceback
+import warnings
+from argparse import Namespace
+
+from tqdm import tqdm
+
+# Import highway_env to register all environments
+import highway_env
+
+import projects.lampilot.utils as U
+from projects.lampilot.dt.dbl import DbLv1Dataset
+from projects.lampilot.dt.vehicle_dt import CtrlVDT
+from projects.lampilot.evaluator import get_evaluator_class, DbLEvaluator
+
+warnings.simplefilter("ignore")
+
+parser = argparse.ArgumentParser(description="Serve policy evaluations on a Unix socket, from a process keeping the "
+                                             "simulation imported and the environments of past episodes warm")
+parser.add_argument('--socket', type=str, default='ckpt/eval_server.sock')
+parser.add_argument('--config-root', type=str, default='projects/lampilot/configs/DbLv1')
+parser.add_argument('--snapshot-dir', type=str, default='',
+                    help='directory sharing the post-warm-up snapshots across runs, e.g. ckpt/snapshots')
+parser.add_argument('--preload', action='store_true', help='simulate the warm-up of every sample before serving')
+
+args: Namespace = parser.parse_args()
+
+
+class EvalRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Evaluate the jobs sent on a connection, one JSON object per line, and stream back JSON lines.
+
+    A job has a policy, as generated by the agents, i.e. {"reused_code": ..., "new_code": ...}, and either the
+    "sample_id" of a sample of the dataset, e.g. "left_lc_s0", or a "sample" config. An optional "command" is recorded
+    in the result, and "metrics_every" sets the number of frames between two "step" events, 0 to stream none.
+    Each job is answered by its "step" events, then by a "result" event with the result dict of the episode, or an
+    "error" event.
+    """
+
+    def send(self, event: str, **content):
+        self.wfile.write((json.dumps({'event': event, **content}) + "\n").encode())
+        self.wfile.flush()
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                job = json.loads(line)
+                self.evaluate(job)
+            except (BrokenPipeError, ConnectionResetError):  # the client left, aborting the episode
+                return
+            except Exception as e:
+                traceback.print_exc()
+                self.send("error", message=f"{type(e).__name__}: {e}")
+
+    def evaluate(self, job: dict):
+        if 'sample' in job:
+            sample, iid = job['sample'], job.get('iid', "sample")
+        elif job.get('sample_id') in self.server.samples:
+            sample, iid = self.server.samples[job['sample_id']], job['sample_id']
+        else:
+            raise ValueError(f"Unknown sample id: {job.get('sample_id')}")
+        metrics_every = job.get('metrics_every', 1)
+
+        evaluator_class = get_evaluator_class(sample['eval']['type'])
+        evaluator: DbLEvaluator = evaluator_class(
+            config=sample,
+            show_window=False,
+            snapshot_dir=args.snapshot_dir,
+        )
+        try:
+            vehicle_dt = CtrlVDT()
+            vehicle_dt.reset(ego_vehicle=evaluator.env.unwrapped.vehicle)
+            with U.timed(evaluator.timings, 'execute'):
+                vehicle_dt.execute(job['policy'])
+            while not evaluator.ended:
+                evaluator.step(vehicle_dt)
+                if metrics_every and evaluator.frame % metrics_every == 0:
+                    self.send("step", frame=evaluator.frame, time=evaluator.overall_time,
+                              **{name: float(value) for name, value in evaluator.queue[-1].items()})
+        finally:
+            evaluator.close()
+        evaluator.timings['policy'] = vehicle_dt.policy_time
+        result = U.create_result_dict(iid, evaluator, show=False, code=job['policy'], command=job.get('command', ""))
+        self.send("result", **result)
+
+
+class EvalServer(socketserver.UnixStreamServer):
+    """
+    Single process evaluation server, handling one connection at a time.
+
+    Episodes start from the post-warm-up snapshots and idle environments that DbLEvaluator keeps in the process, so
+    only the first episode of each sample simulates its warm-up, and only the first of each env type builds it.
+    """
+
+    def __init__(self, socket_path: str, samples: dict):
+        self.samples = samples
+        if os.path.exists(socket_path):  # left by a server that did not shut down
+            os.remove(socket_path)
+        if os.path.dirname(socket_path):
+            os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+        super().__init__(socket_path, EvalRequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        os.remove(self.server_address)
+        DbLEvaluator.clear_env_pool()
+
+
+def warm_up(samples: dict):
+    """Create an evaluator of each sample, saving its post-warm-up snapshot for the next episodes."""
+    for sample in tqdm(samples.values(), desc="Warming up samples"):
+        evaluator_class = get_evaluator_class(sample['eval']['type'])
+        evaluator_class(config=sample, show_window=False, snapshot_dir=args.snapshot_dir).close()
+
+
+if __name__ == "__main__":
+    samples = dict(DbLv1Dataset(config_root=args.config_root).samples())
+    if args.preload:
+        warm_up(samples)
+    with EvalServer(args.socket, samples) as server:
+        print(f"Serving evaluations of {len(samples)} samples on {args.socket}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -56,8 +56,7 @@ class ACCEvalbySpeed(DbLEvaluator):
 
         # Out of the time limit.
         if self.overall_time - self.failure_start_time > self.failure_time:
-            self.done = True
-            self.success = False
+            self.fail("time_budget")
 
 
 class ACCEvalbyDistance(DbLEvaluator):
@@ -129,5 +128,4 @@ class ACCEvalbyDistance(DbLEvaluator):
                 self.last_time = -1
 
         if self.overall_time - self.failure_start_time > self.failure_time:
-            self.done = True
-            self.success = False
+            self.fail("time_budget")
@@ -1,17 +1,62 @@
+import atexit
+import copy
+import hashlib
+import json
+import os
+import pickle
 import time
-from collections import deque
+from collections import OrderedDict, deque
+from typing import Dict, Optional
 
 import gymnasium as gym
 import numpy as np
 from gymnasium.wrappers import RecordVideo
 
+import highway_env
+import projects.lampilot.envs
+import projects.lampilot.vehicle
 from highway_env.envs import AbstractEnv
 from highway_env.road.lane import LineType
 from projects.lampilot.dt.vehicle_dt import VehicleDigitalTwin
 import projects.lampilot.utils as U
 
 
+def _simulator_version() -> str:
+    """Hash of the sources of the simulation, whose pickled environments are only valid for the same code."""
+    digest = hashlib.sha1()
+    for package in (highway_env.__file__, projects.lampilot.envs.__file__, projects.lampilot.vehicle.__file__):
+        root = os.path.dirname(package)
+        for directory, dirs, files in sorted(os.walk(root)):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(".py"):
+                    path = os.path.join(directory, name)
+                    digest.update(os.path.relpath(path, root).encode())
+                    with open(path, 'rb') as f:
+                        digest.update(f.read())
+    return digest.hexdigest()
+
+
 class DbLEvaluator:
+    # The evaluation reads the simulation state directly, so these envs skip their observation, reward and info
+    OBSERVATION_FREE_ENVS = ['dt-highway-v0', 'ramp-merge-v0', 'dt-intersection-v0']
+    # Duration of the warm-up [s], simulated with a null action before the agent takes control
+    WARM_UP_DURATION = 3
+    # Version of the simulation code the snapshots are taken with, part of their key
+    SIMULATOR_VERSION = _simulator_version()
+    # Pickled post-warm-up environments of this process, indexed by snapshot key, least recently used first
+    _snapshots: "OrderedDict[str, bytes]" = OrderedDict()
+    # Snapshots kept in memory, 30-45 KB each, beyond which the least recently used are only kept in the snapshot dir
+    MAX_SNAPSHOTS = 512
+    # Idle environments of this process, indexed by env type, reconfigured for the next episodes
+    _env_pool: Dict[str, AbstractEnv] = {}
+    # Time budget of the task [s], after which the episode fails; None to only rely on the env time limit
+    TIME_BUDGET: Optional[float] = None
+    # Time [s] the ego vehicle may stay stopped before the episode fails; None for tasks where stopping is expected
+    MAX_STOPPED_TIME: Optional[float] = None
+    # Speed [m/s] under which the ego vehicle is considered stopped
+    STOPPED_SPEED = 0.5
+
     def __init__(self,
                  config: dict,
                  show_window: bool = True,
@@ -21,7 +66,8 @@ class DbLEvaluator:
                  speed_std_threshold: float = 10.0,
                  time_threshold: float = 60.0,
                  score_weights: dict = None,
-                 video_dir: str = ""
+                 video_dir: str = "",
+                 snapshot_dir: str = ""
                  ):
         self.exp_time = time.strftime("%Y%m%d-%H%M%S")
         self.config: dict = config
@@ -29,6 +75,9 @@ class DbLEvaluator:
         self.show_window = show_window
         self.wait_time = wait_time
         self.video_dir = video_dir
+        self.snapshot_dir = snapshot_dir
+        # Wall time [s] spent in each phase of the episode
+        self.timings: Dict[str, float] = {}
 
         self.safe_ttc_threshold = safe_ttc_threshold
         self.speed_std_threshold = speed_std_threshold
@@ -49,19 +98,108 @@ class DbLEvaluator:
         self.done = self.truncated = False
         self.success = False
         self.collision = False
+        self.failure_reason: Optional[str] = None
+        self.last_moving_time = 0.
+
+    def _make_env(self, config: dict) -> AbstractEnv:
+        env = self._env_pool.pop(config['env']['type'], None)
+        if env is not None:
+            # Start over from the defaults, so that no key set by the sample of a past episode carries over
+            env.unwrapped.config = env.unwrapped.default_config()
+        else:
+            # noinspection PyTypeChecker
+            env: AbstractEnv = gym.make(config['env']['type'], render_mode="rgb_array")
+        if config['env']['type'] in self.OBSERVATION_FREE_ENVS:
+            env.unwrapped.configure({"skip_step_outputs": True})
+        # configure() is a shallow update: copied, the nested settings of the sample are never shared with the env
+        env.unwrapped.configure(copy.deepcopy(config['env']))
+        return env
+
+    @classmethod
+    def clear_env_pool(cls):
+        """Close the idle environments of this process."""
+        while cls._env_pool:
+            cls._env_pool.popitem()[1].close()
 
     def _init_env(self, config: dict):
-        # noinspection PyTypeChecker
-        self.env: AbstractEnv = gym.make(config['env']['type'], render_mode="rgb_array")
-        self.env.unwrapped.configure(config['env'])
-
-        if self.record_video:
-            self.env = RecordVideo(self.env, self.video_dir, name_prefix=f'{self.exp_time}', )
-            self.env.unwrapped.set_record_video_wrapper(self.env)
-
-        self.env.reset(seed=config['seed'])
-        for _ in range(3 * self.env.unwrapped.config['simulation_frequency']):  # warm up
-            self.env.step(np.array([0., 0.]))
+        # The warm-up is deterministic given the sample, so it is simulated once and restored from a snapshot after.
+        # Videos also record the warm-up, hence are never restored.
+        if not self.record_video:
+            with U.timed(self.timings, 'env_construction'):
+                self.env = self._load_snapshot(config)
+            if self.env is not None:
+                return
+
+        with U.timed(self.timings, 'env_construction'):
+            self.env = self._make_env(config)
+
+            if self.record_video:
+                self.env = self._wrap_record_video(self.env)
+
+        with U.timed(self.timings, 'warm_up'):
+            self.env.reset(seed=config['seed'])
+            for _ in range(self.WARM_UP_DURATION * self.env.unwrapped.config['simulation_frequency']):  # warm up
+                self.env.step(np.array([0., 0.]))
+
+            if not self.record_video:
+                self._save_snapshot(config)
+
+    def _wrap_record_video(self, env: AbstractEnv) -> RecordVideo:
+        env = RecordVideo(env, self.video_dir, name_prefix=f'{self.exp_time}', )
+        env.unwrapped.set_record_video_wrapper(env)
+        return env
+
+    def snapshot_key(self, config: dict) -> str:
+        """
+        Hash of the sample settings and simulator version the post-warm-up state depends on.
+        """
+        content = json.dumps({
+            'env': config['env'],
+            'seed': config['seed'],
+            'warm_up_duration': self.WARM_UP_DURATION,
+            'simulator_version': self.SIMULATOR_VERSION,
+            'observation_free': config['env']['type'] in self.OBSERVATION_FREE_ENVS,
+        }, sort_keys=True)
+        return hashlib.sha1(content.encode()).hexdigest()
+
+    def _load_snapshot(self, config: dict) -> Optional[AbstractEnv]:
+        key = self.snapshot_key(config)
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None:
+            self._snapshots.move_to_end(key)
+        elif self.snapshot_dir:
+            try:
+                with open(f"{self.snapshot_dir}/{key}.pkl", 'rb') as f:
+                    snapshot = f.read()
+            except FileNotFoundError:
+                return None
+            self._cache_snapshot(key, snapshot)
+        if snapshot is None:
+            return None
+        try:
+            return pickle.loads(snapshot)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):  # stale or truncated snapshot
+            del self._snapshots[key]
+            return None
+
+    def _save_snapshot(self, config: dict):
+        key = self.snapshot_key(config)
+        snapshot = pickle.dumps(self.env)
+        self._cache_snapshot(key, snapshot)
+        if self.snapshot_dir:
+            # Write then rename, so that concurrent workers never read a partial snapshot
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            tmp_path = f"{self.snapshot_dir}/{key}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(snapshot)
+            os.replace(tmp_path, f"{self.snapshot_dir}/{key}.pkl")
+
+    @classmethod
+    def _cache_snapshot(cls, key: str, snapshot: bytes):
+        cls._snapshots[key] = snapshot
+        cls._snapshots.move_to_end(key)
+        while len(cls._snapshots) > cls.MAX_SNAPSHOTS:
+            cls._snapshots.popitem(last=False)
 
     def _init_ego_vehicle(self):
         self.ego_vehicle = self.env.unwrapped.vehicle
@@ -76,27 +214,71 @@ class DbLEvaluator:
 
     def step(self, agent: VehicleDigitalTwin):
         if self.show_window:
-            self.env.render()
-            time.sleep(self.wait_time)
-        action = agent.act()
-        _, _, self.done, self.truncated, info = self.env.step(action)
+            with U.timed(self.timings, 'render'):
+                self.env.render()
+                time.sleep(self.wait_time)
+        with U.timed(self.timings, 'act'):
+            action = agent.act()
+        with U.timed(self.timings, 'env_step'):
+            _, _, self.done, self.truncated, info = self.env.step(action)
         self.collision = self.ego_vehicle.crashed or not self.ego_vehicle.on_road
 
+        with U.timed(self.timings, 'ttc'):
+            ttc = U.compute_ttc(self.env)
         self._append({
             'acceleration': action[0],
             'steering': action[1],
             'speed': agent.speed,
-            'ttc': U.compute_ttc(self.env)
+            'ttc': ttc
         })
         self.frame += 1
+        if abs(agent.speed) > self.STOPPED_SPEED:
+            self.last_moving_time = self.overall_time
+
+    def check_failure(self) -> Optional[str]:
+        """
+        Detect that the task can no longer be achieved, so that hopeless episodes end early.
+
+        :return: the reason of the failure, or None if the task may still be achieved
+        """
+        if self.TIME_BUDGET is not None and self.overall_time > self.TIME_BUDGET:
+            return "time_budget"
+        if self.MAX_STOPPED_TIME is not None and self.overall_time - self.last_moving_time > self.MAX_STOPPED_TIME:
+            return "stopped"
+        return None
+
+    def terminate_if_failed(self):
+        if not self.ended:
+            reason = self.check_failure()
+            if reason is not None:
+                self.fail(reason)
+
+    def fail(self, reason: str):
+        self.done = True
+        self.success = False
+        self.failure_reason = reason
 
     def close(self):
-        self.env.close()
+        # Without viewer nor video recorder, the environment is kept for the next episode of this env type
+        if not self.record_video and self.env.unwrapped.viewer is None:
+            self._env_pool[self.config['env']['type']] = self.env
+        else:
+            self.env.close()
 
     @property
     def ended(self) -> bool:
         return self.done or self.truncated
 
+    @property
+    def termination_reason(self) -> str:
+        if self.success:
+            return "success"
+        if self.collision:
+            return "collision"
+        if self.failure_reason is not None:
+            return self.failure_reason
+        return "truncated" if self.truncated else "terminated"
+
     @staticmethod
     def human_check_task_success():
         confirmed = False
@@ -182,6 +364,18 @@ class DbLEvaluator:
 
         return None, None, None
 
+    def get_context_features(self) -> dict:
+        f, fd, fs = self._front_vehicle
+        n, rc, re = self._lanes
+        return {
+            'ego_speed': float(self.ego_vehicle.speed),
+            'lanes_count': n,
+            'right_count': rc,
+            'right_emergency_lane': re,
+            'front_distance': float(fd) if f else None,
+            'front_speed': float(fs) if f else None,
+        }
+
     def get_context_info(self) -> str:
         if self.config['env']['type'] in ['ramp-merge-v0', 'dt-highway-v0']:
             f, fd, fs = self._front_vehicle
@@ -212,3 +406,6 @@ class DbLEvaluator:
 
         else:
             raise RuntimeError(f"Unsupported env type {self.config['env']['type']}")
+
+
+atexit.register(DbLEvaluator.clear_env_pool)
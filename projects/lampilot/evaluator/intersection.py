@@ -4,22 +4,22 @@ from highway_env.envs.merge_env import *
 
 
 class IntersectionEval(DbLEvaluator):
+    # The ego vehicle is handed over right after the reset, before reaching the intersection
+    WARM_UP_DURATION = 0
+    TIME_BUDGET = 60
+    # The ego vehicle waits at the stop sign for the cross traffic to clear
+    MAX_STOPPED_TIME = 30
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.target_lane_index = tuple(self.config['eval']['direction'])
         road = self.ego_vehicle.road
         self.target_lane = road.network.get_lane(self.target_lane_index)
 
-    def _init_env(self, config: dict):
-        # noinspection PyTypeChecker
-        self.env: AbstractEnv = gym.make(config['env']['type'], render_mode="rgb_array")
-        self.env.unwrapped.configure(config['env'])
-
-        if self.record_video:
-            self.env = RecordVideo(self.env, f'projects/lampilot/videos/', name_prefix=f'{self.exp_time}')
-            self.env.unwrapped.set_record_video_wrapper(self.env)
-
-        self.env.reset(seed=config['seed'])
+    def _wrap_record_video(self, env: AbstractEnv) -> RecordVideo:
+        env = RecordVideo(env, f'projects/lampilot/videos/', name_prefix=f'{self.exp_time}')
+        env.unwrapped.set_record_video_wrapper(env)
+        return env
 
     def step(self, agent: VehicleDigitalTwin):
         super().step(agent)
@@ -32,3 +32,10 @@ class IntersectionEval(DbLEvaluator):
                  np.isclose(np.abs(ego_heading - lane_heading), 2 * np.pi, atol=1e-3))):
             self.done = True
             self.success = True
+        self.terminate_if_failed()
+
+    def check_failure(self) -> Optional[str]:
+        # Exit lanes start from the inner "il" nodes, and do not lead to one another
+        if self.ego_vehicle.lane_index[0].startswith("il") and self.ego_vehicle.lane_index != self.target_lane_index:
+            return "wrong_exit"
+        return super().check_failure()
@@ -3,6 +3,10 @@ from highway_env.road.road import LaneIndex
 
 
 class LaneChangeEval(DbLEvaluator):
+    TIME_BUDGET = 60
+    # A vehicle stopped in its lane is not changing lanes
+    MAX_STOPPED_TIME = 10
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.start_lane_index: LaneIndex = self.ego_vehicle.lane_index
@@ -33,3 +37,10 @@ class LaneChangeEval(DbLEvaluator):
             if np.abs(ego_heading - lane_heading) < np.deg2rad(5):  # 5 degrees
                 self.done = True
                 self.success = True
+        self.terminate_if_failed()
+
+    def check_failure(self) -> Optional[str]:
+        # The target lane index is that of a road segment, which cannot be reached again once left behind
+        if self.target_lane.local_coordinates(self.ego_vehicle.position)[0] > self.target_lane.length:
+            return "target_lane_passed"
+        return super().check_failure()
@@ -3,6 +3,10 @@ from highway_env.road.road import LaneIndex
 
 
 class OvertakeEval(DbLEvaluator):
+    TIME_BUDGET = 60
+    # A vehicle stopped in its lane is not overtaking
+    MAX_STOPPED_TIME = 10
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if self.config['eval']['direction'] == 'left':
@@ -38,3 +42,14 @@ class OvertakeEval(DbLEvaluator):
                                                       self.target_lane) < -2 * self.ego_vehicle.LENGTH:
             self.done = True
             self.success = True
+        self.terminate_if_failed()
+
+    def check_failure(self) -> Optional[str]:
+        # The target lane index is that of a road segment, which cannot be reached again once left behind
+        if self.target_lane.local_coordinates(self.ego_vehicle.position)[0] > self.target_lane.length:
+            return "target_lane_passed"
+        if self.ego_vehicle.lane_index != self.target_lane_index \
+                and self.ego_vehicle.lane_distance_to(self.front_vehicle,
+                                                      self.target_lane) < -2 * self.ego_vehicle.LENGTH:
+            return "passed_in_wrong_lane"
+        return super().check_failure()
@@ -4,6 +4,10 @@ from highway_env.envs.merge_env import *
 
 
 class PullOverEval(DbLEvaluator):
+    TIME_BUDGET = 60
+    # Stopping in the emergency lane is a success, stopping elsewhere does not pull over
+    MAX_STOPPED_TIME = 10
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         _from, _to, _id = self.ego_vehicle.lane_index
@@ -23,3 +27,4 @@ class PullOverEval(DbLEvaluator):
                                                                                    atol=5e-1):
             self.done = True
             self.success = True
+        self.terminate_if_failed()
@@ -0,0 +1,27 @@
+import argparse
+import os
+from argparse import Namespace
+
+import projects.lampilot.utils as U
+
+parser = argparse.ArgumentParser(description="Merge the results of the shards of a run, as run with --shard-index and "
+                                             "--num-shards, into the checkpoint directory of the run")
+parser.add_argument('--ckpt-dir', type=str, required=True,
+                    help='checkpoint directory of the run, e.g. ckpt/zero-shot/gpt-3.5-turbo or ckpt/heuristic/mobil')
+
+args: Namespace = parser.parse_args()
+
+if __name__ == "__main__":
+    shards_root = f"{args.ckpt_dir}/{U.SHARDS_DIR}"
+    if not os.path.isdir(shards_root):
+        raise FileNotFoundError(f"No shards in {args.ckpt_dir}")
+
+    store = U.load_results(args.ckpt_dir)
+    for shard in sorted(os.listdir(shards_root)):
+        shard_store = U.load_results(f"{shards_root}/{shard}")
+        print(f"Shard {shard}: {len(shard_store)} results")
+        store.merge(shard_store)
+        shard_store.close()
+
+    store.export()
+    U.compute_final_results(store.results())
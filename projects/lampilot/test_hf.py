@@ -1,12 +1,10 @@
 import argparse
 import warnings
 from argparse import Namespace
-from multiprocessing import Pool
 
-from tqdm import tqdm
 
 import projects.lampilot.utils as U
-from projects.lampilot.utils.run import process_item_hf
+from projects.lampilot.utils.run import create_hf_agent, create_llm_cache, init_agent_worker, process_item_hf
 from projects.lampilot.dt.dbl import *
 from projects.lampilot.dt.hf_agent import HumanFeedbackCGAgent
 from projects.lampilot.dt.vehicle_dt import CtrlVDT
@@ -32,6 +30,15 @@ parser.add_argument('--use-demo', action='store_true')
 parser.add_argument('--num-process', type=int, default=1)
 parser.add_argument('--few-shot', action='store_true')
 parser.add_argument('--record-video', action='store_true')
+parser.add_argument('--snapshot-dir', type=str, default='',
+                    help='directory sharing the post-warm-up snapshots across runs, e.g. ckpt/snapshots')
+parser.add_argument('--llm-cache-dir', type=str, default='ckpt/llm_cache')
+parser.add_argument('--llm-cache-size', type=int, default=1024)  # [MB]
+parser.add_argument('--replay', action='store_true')
+parser.add_argument('--start-method', type=str, default="", choices=['', 'fork', 'spawn', 'forkserver'],
+                    help='start method of the worker processes, the platform default if empty')
+parser.add_argument('--schedule', type=str, default='longest-first', choices=['longest-first', 'dataset'],
+                    help='order in which the items are submitted')
 
 args: Namespace = parser.parse_args()
 args.ckpt_dir = f"{args.ckpt_dir}/{args.model_name}"
@@ -48,16 +55,18 @@ if __name__ == '__main__':
         seed=args.random_seed,
     ) if not args.use_demo else None
 
-    results = U.load_results(args.ckpt_dir)
+    store = U.load_results(args.ckpt_dir)
+    evaluated = store.iids()
     vehicle_dt = CtrlVDT()
     hf_agent = HumanFeedbackCGAgent(
         model_name=args.model_name,
         ckpt_dir=args.ckpt_dir,
         resume=args.resume,
+        llm_cache=create_llm_cache(args),
     )
     for item in demo_dataset:
         command, sample, iid = item['command'], item['sample'], item['id']
-        if iid in [r['iid'] for r in results]:
+        if iid in evaluated:
             print(f"Skip {iid} since it has been evaluated.")
             continue
         print(f"{iid} is being evaluated...")
@@ -94,23 +103,21 @@ if __name__ == '__main__':
             hf_agent.receive_feedback(success, critique, commit=commit)
             critiques.append(critique)
 
-        U.dump_json(result, f"{args.ckpt_dir}/cache/{iid}.json", indent=4)
-        results.append(result)
+        store.add(result)
+        evaluated.add(iid)
 
+    items = dataset[:args.test_size]
+    if args.schedule == 'longest-first':
+        items = U.CostModel().fit(store.results(), dataset).longest_first(items)
     args_list = [
         (item['command'], item['sample'], item['id'], args.ckpt_dir, args)
-        for item in dataset[:args.test_size]
-        if item['id'] not in [r['iid'] for r in results]  # skip evaluated items
+        for item in items
+        if item['id'] not in evaluated  # skip evaluated items
     ]
 
-    with Pool(args.num_process) as pool:
-        results += list(
-            tqdm(
-                pool.starmap(process_item_hf, args_list),
-                total=len(args_list),
-                desc="Processing items",
-            )
-        )
+    U.run_items(process_item_hf, args_list, args.num_process, f"{args.ckpt_dir}/results.jsonl",
+                initializer=init_agent_worker, initargs=(create_hf_agent, args),
+                context=U.get_context(args.start_method, U.WORKER_MODULES + U.AGENT_MODULES))
 
-    U.dump_json(results, f"{args.ckpt_dir}/results.json", indent=4)
-    U.compute_final_results(results)
+    store.export()
+    U.compute_final_results(store.results())
@@ -2,14 +2,12 @@ import argparse
 import os.path
 import warnings
 from argparse import Namespace
-from multiprocessing import Pool
-from tqdm import tqdm
 
 # Import highway_env to register all environments
 import highway_env
 
 import projects.lampilot.utils as U
-from projects.lampilot.utils.run import process_item
+from projects.lampilot.utils.run import run_pipeline
 from projects.lampilot.dt.cg_agent import CodeGenerationAgent
 from projects.lampilot.dt.dbl import *
 from projects.lampilot.dt.vehicle_dt import CtrlVDT
@@ -33,11 +31,25 @@ parser.add_argument('--resume', action='store_true')
 parser.add_argument('--random_seed', type=int, default=42)
 parser.add_argument('--use-demo', action='store_true')
 parser.add_argument('--num-process', type=int, default=1)
+parser.add_argument('--num-generations', type=int, default=8)
 parser.add_argument('--few-shot', action='store_true')
 parser.add_argument('--record-video', action='store_true')
+parser.add_argument('--snapshot-dir', type=str, default='',
+                    help='directory sharing the post-warm-up snapshots across runs, e.g. ckpt/snapshots')
+parser.add_argument('--llm-cache-dir', type=str, default='ckpt/llm_cache')
+parser.add_argument('--llm-cache-size', type=int, default=1024)  # [MB]
+parser.add_argument('--replay', action='store_true')
+parser.add_argument('--shard-index', type=int, default=0)
+parser.add_argument('--num-shards', type=int, default=1)
+parser.add_argument('--start-method', type=str, default="", choices=['', 'fork', 'spawn', 'forkserver'],
+                    help='start method of the worker processes, the platform default if empty')
+parser.add_argument('--schedule', type=str, default='longest-first', choices=['longest-first', 'dataset'],
+                    help='order in which the items are submitted')
+parser.add_argument('--work-queue', type=str, default="", help='work queue database shared by the hosts of the run')
+parser.add_argument('--lease-duration', type=float, default=60.)  # [s]
 
 args: Namespace = parser.parse_args()
-args.ckpt_dir = f"{args.ckpt_dir}/{args.model_name}"
+args.ckpt_dir = U.shard_dir(f"{args.ckpt_dir}/{args.model_name}", args.shard_index, args.num_shards)
 
 if __name__ == '__main__':
     dataset = DbLv1DemoDataset(
@@ -50,22 +62,21 @@ if __name__ == '__main__':
         seed=args.random_seed,
     )
 
-    results = U.load_results(args.ckpt_dir)
+    store = U.load_results(args.ckpt_dir)
+    # Items whose evaluation raised an error, e.g. an LLM request, are evaluated again
+    evaluated = {result['iid'] for result in store.results() if result.get('termination') != "error"}
 
+    items = U.shard_items(dataset[:args.test_size], args.shard_index, args.num_shards)
+    if args.schedule == 'longest-first':
+        items = U.CostModel().fit(store.results(), dataset).longest_first(items)
     args_list = [
         (item['command'], item['sample'], item['id'], args.ckpt_dir, args)
-        for item in dataset[:args.test_size]
-        if item['id'] not in [r['iid'] for r in results]  # skip evaluated items
+        for item in items
+        if item['id'] not in evaluated  # skip evaluated items
     ]
 
-    with Pool(args.num_process) as pool:
-        results += list(
-            tqdm(
-                pool.starmap(process_item, args_list),
-                total=len(args_list),
-                desc="Processing items",
-            )
-        )
+    context_infos = {item['id']: item['context_info'] for item in dataset if 'context_info' in item}
+    run_pipeline(args_list, args, f"{args.ckpt_dir}/results.jsonl", context_infos=context_infos)
 
-    U.dump_json(results, f"{args.ckpt_dir}/results.json", indent=4)
-    U.compute_final_results(results)
+    store.export()
+    U.compute_final_results(store.results())
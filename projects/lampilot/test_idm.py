@@ -1,10 +1,6 @@
 import argparse
-import os.path
 import warnings
 from argparse import Namespace
-from multiprocessing import Pool
-
-from tqdm import tqdm
 
 import projects.lampilot.utils as U
 from projects.lampilot.dt.dbl import DbLv1Dataset
@@ -27,11 +23,21 @@ parser.add_argument('--shuffle', action='store_true')
 parser.add_argument('--random_seed', type=int, default=42)
 parser.add_argument('--method', type=str, default='mobil')
 parser.add_argument('--num-process', type=int, default=1)
+parser.add_argument('--snapshot-dir', type=str, default='',
+                    help='directory sharing the post-warm-up snapshots across runs, e.g. ckpt/snapshots')
+parser.add_argument('--shard-index', type=int, default=0)
+parser.add_argument('--num-shards', type=int, default=1)
+parser.add_argument('--start-method', type=str, default="", choices=['', 'fork', 'spawn', 'forkserver'],
+                    help='start method of the worker processes, the platform default if empty')
+parser.add_argument('--schedule', type=str, default='longest-first', choices=['longest-first', 'dataset'],
+                    help='order in which the items are submitted')
+parser.add_argument('--work-queue', type=str, default="", help='work queue database shared by the hosts of the run')
+parser.add_argument('--lease-duration', type=float, default=60.)  # [s]
 
 args: Namespace = parser.parse_args()
 
 
-def process_item(command, sample, iid, cache_path):
+def process_item(command, sample, iid, ckpt_dir):
     global args
     print(f"{iid} is being evaluated...")
     evaluator_class = get_evaluator_class(sample['eval']['type'])
@@ -39,6 +45,7 @@ def process_item(command, sample, iid, cache_path):
         config=sample,
         show_window=False if args.no_window or args.num_process > 1 else True,
         wait_time=1e-5,
+        snapshot_dir=args.snapshot_dir,
     )
     vehicle_dt = MOBILDT() if args.method == 'mobil' else IDMDT()
     vehicle_dt.reset(
@@ -48,7 +55,7 @@ def process_item(command, sample, iid, cache_path):
         evaluator.step(vehicle_dt)
     evaluator.close()
     result = U.create_result_dict(iid, evaluator)
-    U.dump_json(result, cache_path, indent=4)
+    U.add_result(ckpt_dir, result)
     return result
 
 
@@ -61,29 +68,26 @@ if __name__ == '__main__':
     print(dataset._command_stat())
     # print(f"Total number of data items: {len(dataset)}")
 
-    results = []
-    args.ckpt_dir = f"{args.ckpt_dir}/{args.method}"
-    if os.path.exists(f"{args.ckpt_dir}/cache"):
-        for file in os.listdir(f"{args.ckpt_dir}/cache"):
-            if file.endswith(".json"):
-                results.append(U.load_json(f"{args.ckpt_dir}/cache/{file}"))
-        U.dump_json(results, f"{args.ckpt_dir}/results.json", indent=4)
-    else:
-        os.makedirs(f"{args.ckpt_dir}/cache", exist_ok=True)
+    args.ckpt_dir = U.shard_dir(f"{args.ckpt_dir}/{args.method}", args.shard_index, args.num_shards)
+    store = U.load_results(args.ckpt_dir)
+    evaluated_samples = {U.iid_to_sample_id(iid) for iid in store.iids()}
 
+    items = U.shard_items(dataset[:args.test_size], args.shard_index, args.num_shards)
+    if args.schedule == 'longest-first':
+        items = U.CostModel().fit(store.results(), dataset).longest_first(items)
     args_list = [
-        (item['command'], item['sample'], item['id'], f"{args.ckpt_dir}/cache/{item['id']}.json")
-        for item in dataset[:args.test_size]
-        if U.iid_to_sample_id(item['id']) not in [U.iid_to_sample_id(r['iid']) for r in results]
+        (item['command'], item['sample'], item['id'], args.ckpt_dir)
+        for item in items
+        if U.iid_to_sample_id(item['id']) not in evaluated_samples
     ]
 
-    with Pool(args.num_process) as pool:
-        results += list(
-            tqdm(
-                pool.starmap(process_item, args_list),
-                total=len(args_list)
-            )
-        )
+    if args.work_queue:
+        U.run_queue(process_item, {item_args[2]: item_args for item_args in args_list}, args.num_process,
+                    f"{args.ckpt_dir}/results.jsonl", args.ckpt_dir, args.work_queue, args.lease_duration,
+                    context=U.get_context(args.start_method))
+    else:
+        U.run_items(process_item, args_list, args.num_process, f"{args.ckpt_dir}/results.jsonl",
+                    context=U.get_context(args.start_method))
 
-    U.dump_json(results, f"{args.ckpt_dir}/results.json", indent=4)
-    U.compute_final_results(results)
+    store.export()
+    U.compute_final_results(store.results())
@@ -1,5 +1,9 @@
 from projects.lampilot.utils.io import *
 from projects.lampilot.utils.misc import *
+from projects.lampilot.utils.parallel import *
 from projects.lampilot.utils.result import *
+from projects.lampilot.utils.schedule import *
+from projects.lampilot.utils.store import *
+from projects.lampilot.utils.work_queue import *
 # Note: run.py is not imported here to avoid circular imports
 # Import directly from projects.lampilot.utils.run when needed
\ No newline at end of file
@@ -45,13 +45,17 @@ def dump_json(data, file_path, **kwargs):
         json.dump(data, f, **kwargs)
 
 
-def load_results(ckpt_dir: str):
-    results = []
-    if os.path.exists(f"{ckpt_dir}/cache"):
-        for file in os.listdir(f"{ckpt_dir}/cache"):
-            if file.endswith(".json"):
-                results.append(load_json(f"{ckpt_dir}/cache/{file}"))
-        dump_json(results, f"{ckpt_dir}/results.json", indent=4)
-    else:
-        os.makedirs(f"{ckpt_dir}/cache", exist_ok=True)
-    return results
+def append_jsonl(item, file_path, **kwargs):
+    with open(file_path, "a") as f:
+        f.write(json.dumps(item, **kwargs) + "\n")
+
+
+def load_jsonl(file_path, **kwargs):
+    items = []
+    with open(file_path, "r") as f:
+        for line in f:
+            try:
+                items.append(json.loads(line, **kwargs))
+            except json.JSONDecodeError:  # line truncated by an interrupted run
+                continue
+    return items
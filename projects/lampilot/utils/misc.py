@@ -1,3 +1,7 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List
+
 import numpy as np
 
 from highway_env.envs import AbstractEnv
@@ -9,6 +13,25 @@ def iid_to_sample_id(iid: str) -> str:
     return iid.split('_c')[0]
 
 
+def shard_items(items: Iterable[dict], shard_index: int, num_shards: int) -> List[dict]:
+    """
+    Select the data items of one shard of a run split across machines.
+
+    Samples are dealt to the shards in turn, in their order of appearance, so that shards get similar numbers of samples
+    and all the commands of a sample go to the same shard, where its warm-up is simulated once.
+
+    :param items: the data items of the run, in the same order on every machine
+    :param shard_index: the index of the shard, in [0, num_shards)
+    :param num_shards: the number of shards
+    :return: the data items of the shard
+    """
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"Shard index {shard_index} is not in [0, {num_shards})")
+    sample_shards = {}
+    return [item for item in items
+            if sample_shards.setdefault(iid_to_sample_id(item['id']), len(sample_shards) % num_shards) == shard_index]
+
+
 def compute_ttc(env: AbstractEnv) -> float:
     unwrapped_env = env.unwrapped if hasattr(env, 'unwrapped') else env
     ego_vehicle: Vehicle = unwrapped_env.vehicle
@@ -29,6 +52,16 @@ def compute_ttc(env: AbstractEnv) -> float:
     return ttc
 
 
+@contextmanager
+def timed(timings: Dict[str, float], phase: str):
+    """Add the wall time spent in the context to the total of a phase."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0.) + time.perf_counter() - start
+
+
 def ordinal(n: int):
     if 10 <= n % 100 < 20:
         return str(n) + 'th'
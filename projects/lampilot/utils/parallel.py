@@ -0,0 +1,170 @@
+import importlib
+import multiprocessing
+import time
+import traceback
+from multiprocessing.context import BaseContext
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from tqdm import tqdm
+
+from .io import append_jsonl
+from .store import ResultStore
+from .work_queue import Heartbeat, WorkQueue
+
+# Interval [s] between two polls of a work queue whose remaining items are all leased by other workers
+QUEUE_POLL_INTERVAL = 5.
+# Modules imported by worker processes before their first item
+WORKER_MODULES = [
+    'highway_env',
+    'projects.lampilot.envs',
+    'projects.lampilot.evaluator',
+    'projects.lampilot.dt.vehicle_dt',
+]
+# Modules of the agents, to preload in workers generating code, which depend on langchain
+AGENT_MODULES = [
+    'projects.lampilot.dt.cg_agent',
+    'projects.lampilot.dt.hf_agent',
+]
+
+
+def preload_modules(modules: Sequence[str] = tuple(WORKER_MODULES)):
+    """Worker initialiser importing modules, so that the first item of a worker does not pay for them."""
+    for module in modules:
+        importlib.import_module(module)
+
+
+def get_context(start_method: str = "", modules: Sequence[str] = tuple(WORKER_MODULES)) -> BaseContext:
+    """
+    Multiprocessing context of the worker processes.
+
+    :param start_method: 'fork', 'spawn' or 'forkserver', or the default of the platform if empty. The fork server
+        imports the modules once, and forks each worker from this warm state, without inheriting the threads and open
+        connections of the main process.
+    :param modules: the modules preloaded by the fork server
+    """
+    context = multiprocessing.get_context(start_method or None)
+    if start_method == 'forkserver':
+        context.set_forkserver_preload(list(modules))
+    return context
+
+
+def _call_item(job: Tuple[int, Callable[..., dict], tuple]) -> Tuple[int, dict]:
+    index, func, args = job
+    return index, func(*args)
+
+
+def run_items(func: Callable[..., dict], args_list: Sequence[tuple], num_process: int, results_log: str,
+              initializer: Callable = preload_modules, initargs: tuple = (), context: BaseContext = None) -> List[dict]:
+    """
+    Evaluate items in a pool of processes, collecting each result as soon as its episode finishes.
+
+    Results are appended to a JSON lines log as they arrive, so that the finished episodes of an interrupted run are
+    kept, and the progress bar reports the live throughput.
+
+    :param func: the function evaluating an item and returning its result
+    :param args_list: the arguments of each call to func
+    :param num_process: number of worker processes
+    :param results_log: path of the append-only results log
+    :param initializer: function called by each worker process as it starts, e.g. to build the state it reuses across
+        items
+    :param initargs: the arguments of initializer
+    :param context: multiprocessing context of the worker processes, see get_context
+    :return: the results, in the order of args_list
+    """
+    results = [None] * len(args_list)
+    jobs = [(index, func, args) for index, args in enumerate(args_list)]
+    with (context or get_context()).Pool(num_process, initializer, initargs) as pool:
+        for index, result in tqdm(pool.imap_unordered(_call_item, jobs), total=len(jobs), desc="Processing items"):
+            append_jsonl(result, results_log)
+            results[index] = result
+    return results
+
+
+def settle_unknown_item(queue: WorkQueue, store: ResultStore, iid: str, worker: str):
+    """
+    Settle a leased item missing from the items of the host of the worker.
+
+    The item is done if its result is in the store, e.g. evaluated before the host started. Otherwise the host runs with
+    other settings, e.g. another test size, and the item is given back for the hosts that have it.
+    """
+    if iid in store:
+        queue.complete(iid, worker)
+    else:
+        queue.skip(iid, worker)
+
+
+def consume_queue(func: Callable[..., dict], items: Dict[str, tuple], queue_path: str, lease_duration: float,
+                  results_log: str, ckpt_dir: str) -> List[dict]:
+    """
+    Evaluate the items leased from a work queue, one at a time, until all the items of the queue it may evaluate are
+    finished.
+
+    An item raising an error is given back to the queue, as are items missing from items, see settle_unknown_item. Once the queue has no item left to lease, the worker keeps
+    polling it until the items leased by other workers are done, to take over those whose lease expires.
+
+    :param func: the function evaluating an item and returning its result
+    :param items: the arguments of the call to func of each item id of the queue still to evaluate
+    :param queue_path: path of the work queue database
+    :param lease_duration: duration [s] of a lease without heartbeat
+    :param results_log: path of the append-only results log
+    :param ckpt_dir: checkpoint directory of the result store of the run
+    :return: the results of the items evaluated by this worker
+    """
+    queue = WorkQueue(queue_path, lease_duration)
+    store = ResultStore(ckpt_dir)
+    worker = WorkQueue.worker_id()
+    results = []
+    while True:
+        iid = queue.lease(worker)
+        if iid is None:
+            if queue.unfinished() == 0:
+                break
+            time.sleep(min(QUEUE_POLL_INTERVAL, lease_duration))
+            continue
+        if iid not in items:
+            settle_unknown_item(queue, store, iid, worker)
+            continue
+        try:
+            with Heartbeat(queue, iid, worker):
+                result = func(*items[iid])
+        except Exception:
+            traceback.print_exc()
+            queue.release(iid, worker)
+            continue
+        append_jsonl(result, results_log)
+        queue.complete(iid, worker)
+        results.append(result)
+        print(f"{iid} is done, {queue.unfinished()} items left in the queue.")
+    queue.close()
+    store.close()
+    return results
+
+
+def run_queue(func: Callable[..., dict], items: Dict[str, tuple], num_process: int, results_log: str, ckpt_dir: str,
+              queue_path: str, lease_duration: float = 60., initializer: Callable = preload_modules,
+              initargs: tuple = (), context: BaseContext = None) -> List[dict]:
+    """
+    Evaluate items with worker processes pulling them from a work queue, which balances the load as items finish.
+
+    Several hosts sharing the filesystem of the queue may run the same command: each enqueues the items missing from
+    the queue, then all of them pull from it.
+
+    :param func: the function evaluating an item and returning its result
+    :param items: the arguments of the call to func of each item id
+    :param num_process: number of worker processes
+    :param results_log: path of the append-only results log
+    :param ckpt_dir: checkpoint directory of the result store of the run
+    :param queue_path: path of the work queue database
+    :param lease_duration: duration [s] of a lease without heartbeat
+    :param initializer: function called by each worker process as it starts
+    :param initargs: the arguments of initializer
+    :param context: multiprocessing context of the worker processes, see get_context
+    :return: the results of the items evaluated on this host
+    """
+    queue = WorkQueue(queue_path, lease_duration)
+    queue.put(items)
+    queue.close()
+    jobs = [(func, items, queue_path, lease_duration, results_log, ckpt_dir)] * num_process
+    with (context or get_context()).Pool(num_process, initializer, initargs) as pool:
+        worker_results = pool.starmap(consume_queue, jobs)
+    return [result for results in worker_results for result in results]
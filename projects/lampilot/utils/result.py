@@ -1,3 +1,5 @@
+from collections import Counter
+
 import numpy as np
 
 
@@ -11,6 +13,8 @@ def create_result_dict(iid: str, evaluator, show=True, code: dict = None, comman
         'time_efficiency_score': evaluator.score_time_efficiency,
         'success': evaluator.success,
         'collision': evaluator.collision,
+        'termination': evaluator.termination_reason,
+        'timings': dict(evaluator.timings),
         'command': command,
         'context': context_info,
     }
@@ -24,10 +28,28 @@ def create_result_dict(iid: str, evaluator, show=True, code: dict = None, comman
         print(f"SV score: {ret['speed_variance_score']:.1f}")
         print(f"TE score: {ret['time_efficiency_score']:.1f}")
         print(f"Success: {ret['success']}")
-        print(f"Collision: {ret['collision']}\n")
+        print(f"Collision: {ret['collision']}")
+        print(f"Termination: {ret['termination']}\n")
     return ret
 
 
+def create_error_result_dict(iid: str, error: Exception, command: str = "", context_info: str = "") -> dict:
+    """Result of an item whose evaluation raised an error, e.g. an LLM request, counted as a failure."""
+    return {
+        'iid': iid,
+        'overall_score': 0.,
+        'ttc_score': 0.,
+        'speed_variance_score': 0.,
+        'time_efficiency_score': 0.,
+        'success': False,
+        'collision': False,
+        'termination': "error",
+        'error': f"{type(error).__name__}: {error}",
+        'command': command,
+        'context': context_info,
+    }
+
+
 def compute_final_results(results, show=True) -> dict:
     ttc_score = np.mean([r['ttc_score'] for r in results if r['success']])
     sv_score = np.mean([r['speed_variance_score'] for r in results if r['success']])
@@ -36,6 +58,11 @@ def compute_final_results(results, show=True) -> dict:
     success_rate = np.mean([r['success'] for r in results])
     collision_rate = np.mean([r['collision'] for r in results])
     driving_score = success_rate * overall_score - collision_rate * 500
+    # Results of runs preceding the recording of termination reasons and timings have none
+    terminations = dict(Counter(r.get('termination', 'unknown') for r in results))
+    timed_results = [r['timings'] for r in results if 'timings' in r]
+    phases = sorted({phase for timings in timed_results for phase in timings})
+    timings = {phase: np.mean([t.get(phase, 0.) for t in timed_results]).item() for phase in phases}
     if show:
         print(f"========================================\n")
         print(f"Total number of episodes: {len(results)}")
@@ -46,6 +73,8 @@ def compute_final_results(results, show=True) -> dict:
         print(f"Success rate: {success_rate * 100:.1f}%")
         print(f"Collision rate: {collision_rate * 100:.1f}%")
         print(f"Driving score: {driving_score:.1f}")
+        print("Terminations: " + ", ".join(f"{reason} {count}" for reason, count in sorted(terminations.items())))
+        print("Mean phase timings [s]: " + ", ".join(f"{phase} {t:.3f}" for phase, t in timings.items()))
         print(f"========================================\n")
     return {
         'ttc_score': ttc_score,
@@ -55,4 +84,6 @@ def compute_final_results(results, show=True) -> dict:
         'success_rate': success_rate,
         'collision_rate': collision_rate,
         'driving_score': driving_score,
+        'terminations': terminations,
+        'timings': timings,
     }
@@ -1,84 +1,242 @@
+import asyncio
+import copy
+import traceback
 from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, TYPE_CHECKING
+
+from tqdm import tqdm
 
 # Import highway_env to register all environments (important for multiprocessing)
 import highway_env
 
-from projects.lampilot.dt.cg_agent import CodeGenerationAgent
-from projects.lampilot.dt.hf_agent import HumanFeedbackCGAgent
+from projects.lampilot.dt.llm_cache import LLMResponseCache
 from projects.lampilot.dt.vehicle_dt import CtrlVDT
 from projects.lampilot.evaluator import get_evaluator_class, DbLEvaluator
-from .io import dump_json
-from .result import create_result_dict
+from .io import append_jsonl
+from .misc import timed
+from .parallel import QUEUE_POLL_INTERVAL, get_context, preload_modules, settle_unknown_item
+from .result import create_error_result_dict, create_result_dict
+from .store import ResultStore, add_result
+from .work_queue import WorkQueue
 
+# The agents depend on langchain, which simulation-only workers do not need to load
+if TYPE_CHECKING:
+    from projects.lampilot.dt.cg_agent import CodeGenerationAgent
+    from projects.lampilot.dt.hf_agent import HumanFeedbackCGAgent
 
-def process_item(command: str, sample: dict, iid: str, output_dir: str, args: Namespace,
-                 agent: CodeGenerationAgent = None):
-    print(f"{iid} is being evaluated...")
-    cache_path = f"{output_dir}/cache/{iid}.json"
+# Agents of the process by factory, built for its first item and reused for the next ones, along with the HTTP
+# connections of their LLM clients
+_process_agents: Dict[str, 'CodeGenerationAgent'] = {}
+
+
+def create_llm_cache(args: Namespace) -> Optional[LLMResponseCache]:
+    if not getattr(args, 'llm_cache_dir', ""):
+        return None
+    return LLMResponseCache(args.llm_cache_dir, max_size=args.llm_cache_size << 20, replay=args.replay)
+
+
+def create_agent(args: Namespace) -> 'CodeGenerationAgent':
+    from projects.lampilot.dt.cg_agent import CodeGenerationAgent
+    return CodeGenerationAgent(
+        model_name=args.model_name,
+        zero_shot=not args.few_shot,
+        llm_cache=create_llm_cache(args),
+    )
+
+
+def create_hf_agent(args: Namespace) -> 'HumanFeedbackCGAgent':
+    from projects.lampilot.dt.hf_agent import HumanFeedbackCGAgent
+    return HumanFeedbackCGAgent(
+        model_name=args.model_name,
+        ckpt_dir=args.ckpt_dir,
+        resume=True,
+        llm_cache=create_llm_cache(args),
+    )
+
+
+def get_process_agent(agent_factory: Callable[[Namespace], 'CodeGenerationAgent'],
+                      args: Namespace) -> 'CodeGenerationAgent':
+    """The agent of the process built by agent_factory, which is reset by each item using it."""
+    if agent_factory.__name__ not in _process_agents:
+        _process_agents[agent_factory.__name__] = agent_factory(args)
+    return _process_agents[agent_factory.__name__]
+
+
+def init_agent_worker(agent_factory: Callable[[Namespace], 'CodeGenerationAgent'], args: Namespace):
+    """Worker initialiser preloading the simulation and building the agent of the worker before its first item."""
+    preload_modules()
+    get_process_agent(agent_factory, args)
+
+
+def create_evaluator(sample: dict, iid: str, output_dir: str, args: Namespace) -> DbLEvaluator:
     evaluator_class = get_evaluator_class(sample['eval']['type'])
-    evaluator: DbLEvaluator = evaluator_class(
+    return evaluator_class(
         config=sample,
         show_window=False if args.no_window or args.num_process > 1 else True,
         wait_time=1e-5,
         record_video=args.record_video,
         video_dir=f"{output_dir}/videos/{iid}",
+        snapshot_dir=getattr(args, 'snapshot_dir', ""),
     )
-    if agent is None:
-        agent = CodeGenerationAgent(
-            model_name=args.model_name,
-            zero_shot=not args.few_shot,
-        )
-    vehicle_dt = CtrlVDT()
-    context_info = evaluator.get_context_info()
-    agent.reset(
-        command=command,
-        context_info=context_info,
+
+
+def get_context_info(sample: dict, args: Namespace) -> str:
+    evaluator_class = get_evaluator_class(sample['eval']['type'])
+    evaluator: DbLEvaluator = evaluator_class(
+        config=sample,
+        show_window=False,
+        snapshot_dir=getattr(args, 'snapshot_dir', ""),
     )
+    context_info = evaluator.get_context_info()
+    evaluator.close()
+    return context_info
+
+
+def evaluate_policy(command: str, sample: dict, iid: str, output_dir: str, args: Namespace, policy: dict,
+                    context_info: str, evaluator: DbLEvaluator = None, timings: Dict[str, float] = None):
+    if evaluator is None:
+        evaluator = create_evaluator(sample, iid, output_dir, args)
+    # Phases that ran before the simulation, in another process or with another evaluator
+    evaluator.timings.update(timings or {})
+    vehicle_dt = CtrlVDT()
     vehicle_dt.reset(
         ego_vehicle=evaluator.env.unwrapped.vehicle
     )
-    policy = agent.step()
-    vehicle_dt.execute(policy)
+    with timed(evaluator.timings, 'execute'):
+        vehicle_dt.execute(policy)
     while not evaluator.ended:
         evaluator.step(vehicle_dt)
     evaluator.close()
+    # Policy ticks are part of the 'act' phase of the evaluator
+    evaluator.timings['policy'] = vehicle_dt.policy_time
     result = create_result_dict(iid, evaluator, code=policy, command=command, context_info=context_info)
-    dump_json(result, cache_path, indent=4)
+    add_result(output_dir, result)
     return result
 
 
+def run_pipeline(args_list: List[tuple], args: Namespace, results_log: str,
+                 context_infos: Dict[str, str] = None) -> List[dict]:
+    """
+    Evaluate items with code generation and simulation as two concurrent stages.
+
+    Up to args.num_generations LLM requests are awaited at once, while args.num_process worker processes simulate the
+    episodes whose code is ready. Results are appended to the results log as they arrive.
+
+    With args.work_queue, the items are instead pulled from a work queue shared with the other hosts running the same
+    command, by as many consumers as can be busy at once in both stages.
+
+    :param args_list: the (command, sample, iid, output_dir, args) arguments of each item
+    :param args: the run config
+    :param results_log: path of the append-only results log
+    :param context_infos: precomputed context info of items, by item id, to prompt them without an environment
+    :return: the results, in the order of args_list, None for items evaluated by other hosts
+    """
+    results = [None] * len(args_list)
+    # Copied by each item, so that concurrent items share the LLM client and its connection pool
+    agent_template = create_agent(args)
+    context_infos = context_infos or {}
+
+    async def pipeline():
+        loop = asyncio.get_running_loop()
+        generations = asyncio.Semaphore(args.num_generations)
+        # Items started at once, so that the context info jobs of all items are not queued ahead of the episodes
+        in_flight = asyncio.Semaphore(args.num_generations + args.num_process)
+        with ProcessPoolExecutor(args.num_process, mp_context=get_context(getattr(args, 'start_method', "")),
+                                 initializer=preload_modules) as pool, \
+                tqdm(total=len(args_list), desc="Processing items") as progress:
+            async def evaluate(command, sample, iid, output_dir, item_args, context_info):
+                timings = {}
+                if context_info is None:
+                    # Includes the wait for a free worker
+                    with timed(timings, 'context_info'):
+                        context_info = await loop.run_in_executor(pool, get_context_info, sample, item_args)
+                agent = copy.copy(agent_template)
+                agent.reset(
+                    command=command,
+                    context_info=context_info,
+                )
+                async with generations:
+                    with timed(timings, 'llm'):
+                        policy = await agent.astep()
+                return await loop.run_in_executor(pool, evaluate_policy, command, sample, iid, output_dir,
+                                                  item_args, policy, context_info, None, timings)
+
+            async def process(index, command, sample, iid, output_dir, item_args) -> bool:
+                """Evaluate an item, recording a failed result if it raises an error, and return whether it did not."""
+                context_info = context_infos.get(iid)
+                try:
+                    result = await evaluate(command, sample, iid, output_dir, item_args, context_info)
+                except Exception as e:
+                    traceback.print_exc()
+                    result = create_error_result_dict(iid, e, command=command, context_info=context_info or "")
+                    add_result(output_dir, result)
+                append_jsonl(result, results_log)
+                results[index] = result
+                progress.update()
+                return result['termination'] != "error"
+
+            if not getattr(args, 'work_queue', ""):
+                async def bounded_process(index, item):
+                    async with in_flight:
+                        await process(index, *item)
+
+                await asyncio.gather(*(bounded_process(index, item) for index, item in enumerate(args_list)))
+                return
+
+            queue = WorkQueue(args.work_queue, args.lease_duration)
+            store = ResultStore(args.ckpt_dir)
+            worker = WorkQueue.worker_id()
+            indices = {item[2]: index for index, item in enumerate(args_list)}
+            queue.put(indices)
+
+            async def heartbeat(iid):
+                while True:
+                    await asyncio.sleep(args.lease_duration / 3)
+                    queue.heartbeat(iid, worker)
+
+            async def consume():
+                while True:
+                    iid = queue.lease(worker)
+                    if iid is None:
+                        if queue.unfinished() == 0:
+                            return
+                        await asyncio.sleep(min(QUEUE_POLL_INTERVAL, args.lease_duration))
+                        continue
+                    if iid not in indices:
+                        settle_unknown_item(queue, store, iid, worker)
+                        continue
+                    beat = asyncio.create_task(heartbeat(iid))
+                    try:
+                        evaluated = await process(indices[iid], *args_list[indices[iid]])
+                    finally:
+                        beat.cancel()
+                    if evaluated:
+                        queue.complete(iid, worker)
+                    else:
+                        # Retried by another worker unless out of attempts, its result replacing the failed one
+                        queue.release(iid, worker)
+
+            await asyncio.gather(*(consume() for _ in range(args.num_generations + args.num_process)))
+            queue.close()
+            store.close()
+
+    asyncio.run(pipeline())
+    return results
+
+
 def process_item_hf(command: str, sample: dict, iid: str, output_dir: str, args: Namespace,
-                    agent: CodeGenerationAgent = None):
+                    agent: 'CodeGenerationAgent' = None):
     print(f"{iid} is being evaluated...")
-    cache_path = f"{output_dir}/cache/{iid}.json"
-    evaluator_class = get_evaluator_class(sample['eval']['type'])
-    evaluator: DbLEvaluator = evaluator_class(
-        config=sample,
-        show_window=False if args.no_window or args.num_process > 1 else True,
-        wait_time=1e-5,
-        record_video=args.record_video,
-        video_dir=f"{output_dir}/videos/{iid}",
-    )
+    evaluator = create_evaluator(sample, iid, output_dir, args)
     if agent is None:
-        agent = HumanFeedbackCGAgent(
-            model_name=args.model_name,
-            ckpt_dir=args.ckpt_dir,
-            resume=True,
-        )
-    vehicle_dt = CtrlVDT()
-    context_info = evaluator.get_context_info()
+        agent = get_process_agent(create_hf_agent, args)
+    with timed(evaluator.timings, 'context_info'):
+        context_info = evaluator.get_context_info()
     agent.reset(
         command=command,
         context_info=context_info,
     )
-    vehicle_dt.reset(
-        ego_vehicle=evaluator.env.unwrapped.vehicle
-    )
-    policy = agent.step()
-    vehicle_dt.execute(policy)
-    while not evaluator.ended:
-        evaluator.step(vehicle_dt)
-    evaluator.close()
-    result = create_result_dict(iid, evaluator, code=policy, command=command, context_info=context_info)
-    dump_json(result, cache_path, indent=4)
-    return result
+    with timed(evaluator.timings, 'llm'):
+        policy = agent.step()
+    return evaluate_policy(command, sample, iid, output_dir, args, policy, context_info, evaluator=evaluator)
@@ -0,0 +1,80 @@
+from typing import Dict, Iterable, List, Tuple
+
+from .misc import iid_to_sample_id
+
+
+class CostModel:
+    """
+    Estimate of the wall time of the episode of a data item, to submit the most expensive items first.
+
+    Episodes are several times longer in some sample families than in others, and the last long episodes of a run
+    submitted in dataset order keep a few workers busy while the others are idle. Evaluating the longest episodes
+    first leaves the shortest ones to even out the load of the workers at the end of the run.
+
+    The cost of a sample is the wall time per vehicle of its (evaluator type, env type) family, times its number of
+    vehicles. This rate is learnt from the timings of the results already recorded, or else taken from priors.
+    """
+
+    # Prior wall time of an episode per vehicle [s], by evaluator type, for families without timed results, as measured
+    # with the MOBIL baseline on one core
+    PRIOR_RATES = {
+        'ACCEvalbySpeed': 0.18,
+        'ACCEvalbyDistance': 0.17,
+        'LaneChangeEval': 0.11,
+        'OvertakeEval': 0.16,
+        'PullOverEval': 0.18,
+        'IntersectionEval': 0.47,
+    }
+    # Prior of evaluator types missing from PRIOR_RATES
+    DEFAULT_PRIOR_RATE = 0.17
+    # Phases of the timings of a result which are not spent by the worker simulating the episode
+    EXCLUDED_PHASES = ('llm', 'context_info', 'policy')
+
+    def __init__(self):
+        self.rates: Dict[Tuple[str, str], float] = {}
+
+    @staticmethod
+    def family(sample: dict) -> Tuple[str, str]:
+        return sample['eval']['type'], sample['env']['type']
+
+    @staticmethod
+    def vehicles_count(sample: dict) -> int:
+        env_config = sample['env']
+        if 'num_vehicles_right' in env_config:
+            # Intersections spawn their traffic by origin, regardless of vehicles_count
+            return env_config['num_vehicles_right'] + env_config.get('num_vehicles_left', 0)
+        return env_config.get('vehicles_count', 1)
+
+    @classmethod
+    def episode_time(cls, result: dict) -> float:
+        return sum(t for phase, t in result['timings'].items() if phase not in cls.EXCLUDED_PHASES)
+
+    def fit(self, results: Iterable[dict], items: Iterable[dict]) -> "CostModel":
+        """
+        Learn the wall time per vehicle of each family from recorded results.
+
+        :param results: the recorded results, those without timings being ignored
+        :param items: data items, mapping the iids of the results to their samples
+        :return: the cost model
+        """
+        samples = {iid_to_sample_id(item['id']): item['sample'] for item in items}
+        times, counts = {}, {}
+        for result in results:
+            sample = samples.get(iid_to_sample_id(result['iid']))
+            if sample is None or 'timings' not in result:
+                continue
+            family = self.family(sample)
+            times[family] = times.get(family, 0.) + self.episode_time(result)
+            counts[family] = counts.get(family, 0) + self.vehicles_count(sample)
+        self.rates = {family: times[family] / max(counts[family], 1) for family in times}
+        return self
+
+    def estimate(self, sample: dict) -> float:
+        """Estimated wall time [s] of the episode of a sample."""
+        family = self.family(sample)
+        rate = self.rates.get(family, self.PRIOR_RATES.get(family[0], self.DEFAULT_PRIOR_RATE))
+        return rate * self.vehicles_count(sample)
+
+    def longest_first(self, items: Iterable[dict]) -> List[dict]:
+        """Sort data items by decreasing estimated cost, keeping the dataset order of items of equal cost."""
+        return sorted(items, key=lambda item: -self.estimate(item['sample']))
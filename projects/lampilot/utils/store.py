@@ -0,0 +1,91 @@
+import json
+import os
+import sqlite3
+from typing import List, Set
+
+from .io import dump_json, load_json, load_jsonl
+
+# Subdirectory of a checkpoint directory holding the checkpoint directories of its shards
+SHARDS_DIR = "shards"
+
+
+class ResultStore:
+    """
+    The evaluation results of a checkpoint directory, indexed by item id in an SQLite database.
+
+    Each result is inserted in its own transaction, so that worker processes can add their results concurrently, and
+    results.json is only written when exported. Workers of a work queue may run on several hosts sharing the checkpoint
+    directory, which is why the database keeps the default rollback journal rather than WAL, whose shared-memory index
+    only works within one host.
+    """
+
+    def __init__(self, ckpt_dir: str):
+        os.makedirs(ckpt_dir, exist_ok=True)
+        self.ckpt_dir = ckpt_dir
+        self.connection = sqlite3.connect(f"{ckpt_dir}/results.db", timeout=60, isolation_level=None)
+        # Databases created in WAL mode by earlier versions stay in it until switched back
+        self.connection.execute("PRAGMA journal_mode=DELETE")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results (iid TEXT PRIMARY KEY, result TEXT NOT NULL)")
+
+    def __contains__(self, iid: str) -> bool:
+        return self.connection.execute("SELECT 1 FROM results WHERE iid = ?", (iid,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def add(self, result: dict):
+        self.connection.execute("INSERT OR REPLACE INTO results (iid, result) VALUES (?, ?)",
+                                (result['iid'], json.dumps(result)))
+
+    def iids(self) -> Set[str]:
+        return {iid for iid, in self.connection.execute("SELECT iid FROM results")}
+
+    def results(self) -> List[dict]:
+        return [json.loads(result) for result, in self.connection.execute("SELECT result FROM results ORDER BY rowid")]
+
+    def export(self, file_path: str = None):
+        dump_json(self.results(), file_path or f"{self.ckpt_dir}/results.json", indent=4)
+
+    def merge(self, other: "ResultStore"):
+        """Add the results of another store, replacing those of the same items."""
+        rows = other.connection.execute("SELECT iid, result FROM results ORDER BY rowid").fetchall()
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.executemany("INSERT OR REPLACE INTO results (iid, result) VALUES (?, ?)", rows)
+
+    def import_legacy(self):
+        """Add the results of runs preceding the store, from cache/*.json files and the results log."""
+        iids = self.iids()
+        legacy = []
+        if os.path.exists(f"{self.ckpt_dir}/cache"):
+            legacy += [load_json(f"{self.ckpt_dir}/cache/{file}") for file in os.listdir(f"{self.ckpt_dir}/cache")
+                       if file.endswith(".json") and file[:-len(".json")] not in iids]
+        if os.path.exists(f"{self.ckpt_dir}/results.jsonl"):
+            legacy += [r for r in load_jsonl(f"{self.ckpt_dir}/results.jsonl") if r['iid'] not in iids]
+        if legacy:
+            with self.connection:
+                self.connection.execute("BEGIN")
+                self.connection.executemany("INSERT OR IGNORE INTO results (iid, result) VALUES (?, ?)",
+                                            [(r['iid'], json.dumps(r)) for r in legacy])
+
+    def close(self):
+        self.connection.close()
+
+
+def shard_dir(ckpt_dir: str, shard_index: int, num_shards: int) -> str:
+    """Checkpoint directory of one shard of a run, merged back into that of the run by merge_shards.py."""
+    if num_shards == 1:
+        return ckpt_dir
+    return f"{ckpt_dir}/{SHARDS_DIR}/{shard_index}-of-{num_shards}"
+
+
+def load_results(ckpt_dir: str) -> ResultStore:
+    store = ResultStore(ckpt_dir)
+    store.import_legacy()
+    return store
+
+
+def add_result(ckpt_dir: str, result: dict):
+    store = ResultStore(ckpt_dir)
+    store.add(result)
+    store.close()
@@ -0,0 +1,130 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+
+class WorkQueue:
+    """
+    The items of a run, leased to worker processes pulling them one at a time, in an SQLite database.
+
+    Workers may run on several hosts sharing the filesystem of the database, which is why it keeps the default rollback
+    journal rather than WAL. A worker holds the lease of its item by heartbeats; the item of a worker that stopped
+    sending them, e.g. after a crash, is leased again once its lease expires, until max_attempts leases.
+    """
+
+    def __init__(self, path: str, lease_duration: float = 60., max_attempts: int = 3):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lease_duration = lease_duration
+        self.max_attempts = max_attempts
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS items ("
+                                "iid TEXT PRIMARY KEY, state TEXT NOT NULL DEFAULT 'pending', "
+                                "worker TEXT, lease_expiry REAL, attempts INTEGER NOT NULL DEFAULT 0)")
+        # Items this connection gave back as not among those it can evaluate, never leased to it again
+        self.connection.execute("CREATE TEMP TABLE skipped (iid TEXT PRIMARY KEY)")
+
+    @staticmethod
+    def worker_id() -> str:
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def put(self, iids: Iterable[str]):
+        """Add items, ignoring those already in the queue, so that every worker host can enqueue the whole run."""
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.executemany("INSERT OR IGNORE INTO items (iid) VALUES (?)", [(iid,) for iid in iids])
+
+    def lease(self, worker: str) -> Optional[str]:
+        """
+        Lease the next pending item, or an item whose lease expired.
+
+        :param worker: id of the worker
+        :return: the id of the leased item, or None if no item is available for now
+        """
+        now = time.time()
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            # Items leased too many times without completing, e.g. crashing their workers, are given up
+            self.connection.execute("UPDATE items SET state = 'failed' WHERE state = 'leased' AND lease_expiry < ? "
+                                    "AND attempts >= ?", (now, self.max_attempts))
+            row = self.connection.execute("SELECT iid FROM items WHERE (state = 'pending' "
+                                          "OR (state = 'leased' AND lease_expiry < ?)) "
+                                          "AND iid NOT IN (SELECT iid FROM skipped) ORDER BY rowid LIMIT 1",
+                                          (now,)).fetchone()
+            if row is None:
+                return None
+            self.connection.execute("UPDATE items SET state = 'leased', worker = ?, lease_expiry = ?, "
+                                    "attempts = attempts + 1 WHERE iid = ?", (worker, now + self.lease_duration, row[0]))
+        return row[0]
+
+    def heartbeat(self, iid: str, worker: str) -> bool:
+        """
+        Extend the lease of an item.
+
+        :return: whether the worker still holds the lease
+        """
+        cursor = self.connection.execute("UPDATE items SET lease_expiry = ? "
+                                         "WHERE iid = ? AND worker = ? AND state = 'leased'",
+                                         (time.time() + self.lease_duration, iid, worker))
+        return cursor.rowcount == 1
+
+    def complete(self, iid: str, worker: str):
+        self.connection.execute("UPDATE items SET state = 'done' WHERE iid = ? AND worker = ?", (iid, worker))
+
+    def release(self, iid: str, worker: str):
+        """Give the item back to the queue after an error, so that another worker can try it unless out of attempts."""
+        self.connection.execute("UPDATE items SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                                "worker = NULL, lease_expiry = NULL WHERE iid = ? AND worker = ? AND state = 'leased'",
+                                (self.max_attempts, iid, worker))
+
+    def skip(self, iid: str, worker: str):
+        """
+        Give back an item that the worker cannot evaluate, e.g. missing from the items of its host, without counting
+        the attempt, so that another worker evaluates it.
+        """
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.execute("UPDATE items SET state = 'pending', worker = NULL, lease_expiry = NULL, "
+                                    "attempts = attempts - 1 WHERE iid = ? AND worker = ? AND state = 'leased'",
+                                    (iid, worker))
+            self.connection.execute("INSERT OR IGNORE INTO skipped (iid) VALUES (?)", (iid,))
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.connection.execute("SELECT state, COUNT(*) FROM items GROUP BY state").fetchall())
+
+    def unfinished(self) -> int:
+        """Number of items pending or leased, which may still be leased by this connection, i.e. not skipped."""
+        return self.connection.execute("SELECT COUNT(*) FROM items WHERE state IN ('pending', 'leased') "
+                                       "AND iid NOT IN (SELECT iid FROM skipped)").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+class Heartbeat:
+    """Background thread renewing the lease of an item while the worker is busy with it."""
+
+    def __init__(self, queue: WorkQueue, iid: str, worker: str):
+        self.args = (queue.path, queue.lease_duration, iid, worker)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        path, lease_duration, iid, worker = self.args
+        # SQLite connections cannot be shared across threads
+        queue = WorkQueue(path, lease_duration)
+        while not self.stopped.wait(lease_duration / 3):
+            queue.heartbeat(iid, worker)
+        queue.close()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()